@@ -3,21 +3,50 @@ UroSmart Backend API
 Flask-based REST API for user authentication and medical report management
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, make_response
 from flask_cors import CORS
+from flask_compress import Compress
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, tuple_, event, DDL
+from sqlalchemy.dialects.postgresql import JSONB
 from flask_bcrypt import Bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_mail import Mail, Message
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
 from datetime import datetime, timedelta
 import os
+import mimetypes
 from werkzeug.utils import secure_filename
 import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from itsdangerous import URLSafeTimedSerializer
 
-import random
+import secrets
+import hmac
 from twilio.rest import Client
 
+# Running under gunicorn's gevent worker (stdlib already monkey-patched)?
+try:
+    import gevent
+    from gevent import monkey
+    GEVENT_PATCHED = monkey.is_module_patched('threading')
+except ImportError:
+    GEVENT_PATCHED = False
+
+# orjson serializes responses straight to bytes (stdlib json used if not installed)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Import TFLite detector (unified model format)
 try:
     from tflite_detector import detect_objects, get_detector
@@ -35,8 +64,37 @@ except ImportError as e:
     print(f"⚠️  Federated learning not available: {e}")
     FEDERATED_AVAILABLE = False
 
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (numpy values and non-str keys allowed)"""
+    
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.OPTIONS)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """stdlib JSON provider that also serializes numpy arrays/scalars (orjson fallback)"""
+    
+    @staticmethod
+    def default(o):
+        if hasattr(o, 'tolist'):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app) if ORJSON_AVAILABLE else NumpyJSONProvider(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
@@ -46,6 +104,23 @@ app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['SKIP_MODEL_PRELOAD'] = os.environ.get('SKIP_MODEL_PRELOAD', 'False').lower() == 'true'
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['USE_X_ACCEL_REDIRECT'] = os.environ.get('USE_X_ACCEL_REDIRECT', 'False').lower() == 'true'
+
+# Response compression (JSON/text only; images and PDFs are already compressed)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 1024
+
+# Connection pool for server databases (SQLite manages its own connections)
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800
+    }
 
 # Email Configuration
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -61,6 +136,14 @@ app.config['TWILIO_ACCOUNT_SID'] = os.environ.get('TWILIO_ACCOUNT_SID')
 app.config['TWILIO_AUTH_TOKEN'] = os.environ.get('TWILIO_AUTH_TOKEN')
 app.config['TWILIO_PHONE_NUMBER'] = os.environ.get('TWILIO_PHONE_NUMBER')
 
+# Twilio client is created once so its HTTPS connection pool is reused across requests
+twilio_client = None
+if app.config['TWILIO_ACCOUNT_SID'] and app.config['TWILIO_AUTH_TOKEN']:
+    twilio_client = Client(app.config['TWILIO_ACCOUNT_SID'], app.config['TWILIO_AUTH_TOKEN'])
+
+# SMS is sent in the background so responses don't wait on Twilio
+sms_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sms')
+
 # Validate critical secrets
 if not app.config['SECRET_KEY']:
     if os.environ.get('FLASK_ENV') == 'production':
@@ -69,7 +152,20 @@ if not app.config['SECRET_KEY']:
         print("⚠️  WARNING: No SECRET_KEY set. Using insecure default for development.")
         app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
 
-if not app.config['JWT_SECRET_KEY']:
+# Optional Ed25519 token signing: JWT_PRIVATE_KEY holds a PEM private key
+# (newlines may be escaped as \n). The PEM is parsed once here and the key objects
+# are handed to PyJWT, so signing/verifying never re-parses it per token.
+if os.environ.get('JWT_PRIVATE_KEY'):
+    jwt_private_key = serialization.load_pem_private_key(
+        os.environ['JWT_PRIVATE_KEY'].replace('\\n', '\n').encode(), password=None
+    )
+    if not isinstance(jwt_private_key, ed25519.Ed25519PrivateKey):
+        raise ValueError("JWT_PRIVATE_KEY must be an Ed25519 private key")
+    app.config['JWT_ALGORITHM'] = 'EdDSA'
+    app.config['JWT_PRIVATE_KEY'] = jwt_private_key
+    app.config['JWT_PUBLIC_KEY'] = jwt_private_key.public_key()
+
+if not app.config['JWT_SECRET_KEY'] and not app.config.get('JWT_PRIVATE_KEY'):
     if os.environ.get('FLASK_ENV') == 'production':
         raise ValueError("No JWT_SECRET_KEY set for production application")
     else:
@@ -88,20 +184,68 @@ from flask_limiter.util import get_remote_address
 # Configure CORS based on environment
 cors_origins = os.environ.get('CORS_ORIGINS', '*').split(',')
 CORS(app, resources={r"/api/*": {"origins": cors_origins}})
+Compress(app)
 
 db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+bcrypt = Bcrypt(app)  # Only used to verify legacy hashes before upgrading them
 jwt = JWTManager(app)
 mail = Mail(app)
 
 # Initialize Rate Limiter
+# Counters live in Redis when configured so limits hold across gunicorn workers
+ratelimit_storage_uri = app.config['REDIS_URL'] or "memory://"
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=ratelimit_storage_uri,
+    storage_options={'max_connections': 50} if app.config['REDIS_URL'] else {},
+    strategy="fixed-window"
+)
+
+# OTPs are kept hashed in Redis with a TTL when available (no users-table writes)
+OTP_TTL_SECONDS = 600
+redis_client = None
+if app.config['REDIS_URL']:
+    import redis
+    redis_client = redis.Redis.from_url(app.config['REDIS_URL'])
+
+
+def run_cpu_bound(func, *args, **kwargs):
+    """
+    Run CPU-heavy C code on gevent's native thread pool when running under the
+    gevent worker, so the event loop keeps serving other requests meanwhile
+    """
+    if GEVENT_PATCHED:
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
+
+def hash_otp(phone_number, otp):
+    """Keyed hash of an OTP, so Redis never holds the plaintext code"""
+    message = f"{phone_number}:{otp}".encode()
+    return hmac.new(app.config['SECRET_KEY'].encode(), message, hashlib.sha256).hexdigest()
+
+
+# Load and warm up the detector at startup so the first request doesn't pay for it
+if ML_AVAILABLE and not app.config['SKIP_MODEL_PRELOAD']:
+    get_detector().warmup()
+
+# Argon2id password hashing (costs tunable per deployment, ~100ms per hash)
+password_hasher = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 19456)),  # KiB
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1))
 )
 
+def verify_argon2_hash(password_hash, password):
+    """Verify an argon2 hash, returning False instead of raising on mismatch"""
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
 # Database Models
 class User(db.Model):
     __tablename__ = 'users'
@@ -119,10 +263,22 @@ class User(db.Model):
     reports = db.relationship('MedicalReport', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = run_cpu_bound(password_hasher.hash, password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """Verify password, upgrading legacy bcrypt/outdated hashes on success"""
+        if self.password_hash.startswith('$2'):
+            if not run_cpu_bound(bcrypt.check_password_hash, self.password_hash, password):
+                return False
+            self.set_password(password)
+            return True
+        
+        if not run_cpu_bound(verify_argon2_hash, self.password_hash, password):
+            return False
+        
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
     
     def to_dict(self):
         return {
@@ -133,59 +289,75 @@ class User(db.Model):
         }
 
     def generate_otp(self):
-        """Generate 6-digit OTP and set expiration"""
+        """Generate 6-digit OTP and set expiration (in Redis if configured, else on the user row)"""
         if app.debug or app.testing:
             # Deterministic OTP for development: last 6 digits of phone number
             digits = ''.join(filter(str.isdigit, self.phone_number))
             if len(digits) >= 6:
-                self.reset_otp = digits[-6:]
+                otp = digits[-6:]
             else:
-                self.reset_otp = digits.ljust(6, '0')
+                otp = digits.ljust(6, '0')
         else:
-            self.reset_otp = str(random.randint(100000, 999999))
-            
-        self.reset_otp_expires = datetime.utcnow() + timedelta(minutes=10)
-        return self.reset_otp
+            otp = f"{secrets.randbelow(900000) + 100000:06d}"
+        
+        if redis_client is not None:
+            redis_client.setex(f"otp:{self.phone_number}", OTP_TTL_SECONDS, hash_otp(self.phone_number, otp))
+        else:
+            self.reset_otp = otp
+            self.reset_otp_expires = datetime.utcnow() + timedelta(seconds=OTP_TTL_SECONDS)
+        return otp
 
     def verify_otp(self, otp):
-        """Verify OTP and expiration"""
+        """Verify OTP and expiration (a Redis-stored OTP is consumed by the attempt)"""
+        # Compared as bytes: clients may send the OTP as a JSON number, and
+        # compare_digest rejects non-ASCII str
+        otp = str(otp)
+        
+        if redis_client is not None:
+            # GETDEL reads and removes in one atomic step, so two concurrent resets
+            # can't both consume the same OTP
+            stored = redis_client.getdel(f"otp:{self.phone_number}")
+            return stored is not None and hmac.compare_digest(
+                stored, hash_otp(self.phone_number, otp).encode()
+            )
+        
         if not self.reset_otp or not self.reset_otp_expires:
             return False
-        if self.reset_otp != otp:
+        if not hmac.compare_digest(self.reset_otp.encode(), otp.encode()):
             return False
         if datetime.utcnow() > self.reset_otp_expires:
             return False
         return True
 
 
+# Keyset pagination of the reports list (opt-in via ?limit= / ?cursor=)
+REPORTS_PAGE_SIZE = 50
+REPORTS_MAX_PAGE_SIZE = 200
+
+# Analytes reported per case (keys of MedicalReport.results)
+ANALYTES = ('yeast', 'triple_phosphate', 'calcium_oxalate', 'squamous_cells', 'uric_acid')
+
+
 class MedicalReport(db.Model):
     __tablename__ = 'medical_reports'
+    __table_args__ = (
+        # Serves the reports list (filter by user, newest first, id as tie-breaker)
+        # as one index range scan
+        db.Index('ix_reports_user_date', 'user_id', db.desc('report_date'), db.desc('id')),
+        # Trigram index so case_number substring search (LIKE '%...%') is an index lookup
+        db.Index(
+            'ix_reports_case_trgm', 'case_number',
+            postgresql_using='gin', postgresql_ops={'case_number': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     case_number = db.Column(db.String(50), nullable=False, index=True)
-    report_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    
-    # Analysis results
-    yeast_present = db.Column(db.Boolean, default=False)
-    yeast_count = db.Column(db.Integer, default=0)
-    yeast_confidence = db.Column(db.Float, default=0.0)
-    
-    triple_phosphate_present = db.Column(db.Boolean, default=False)
-    triple_phosphate_count = db.Column(db.Integer, default=0)
-    triple_phosphate_confidence = db.Column(db.Float, default=0.0)
+    report_date = db.Column(db.DateTime, default=datetime.utcnow)
     
-    calcium_oxalate_present = db.Column(db.Boolean, default=False)
-    calcium_oxalate_count = db.Column(db.Integer, default=0)
-    calcium_oxalate_confidence = db.Column(db.Float, default=0.0)
-    
-    squamous_cells_present = db.Column(db.Boolean, default=False)
-    squamous_cells_count = db.Column(db.Integer, default=0)
-    squamous_cells_confidence = db.Column(db.Float, default=0.0)
-    
-    uric_acid_present = db.Column(db.Boolean, default=False)
-    uric_acid_count = db.Column(db.Integer, default=0)
-    uric_acid_confidence = db.Column(db.Float, default=0.0)
+    # Analysis results: {analyte: {'present': bool, 'count': int, 'confidence': float}}
+    results = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'), nullable=False, default=dict)
     
     # File paths
     image_paths = db.Column(db.Text)  # JSON array of image paths
@@ -193,61 +365,157 @@ class MedicalReport(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
+    @staticmethod
+    def results_from_fields(data):
+        """Build the results dict from flat <analyte>_present/_count/_confidence fields"""
         return {
+            analyte: {
+                'present': data.get(f'{analyte}_present', False),
+                'count': data.get(f'{analyte}_count', 0),
+                'confidence': data.get(f'{analyte}_confidence', 0.0)
+            }
+            for analyte in ANALYTES
+        }
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a report row (ORM instance attributes or a result mapping)"""
+        return {
+            'id': row['id'],
+            'case_number': row['case_number'],
+            'report_date': row['report_date'].isoformat(),
+            'results': row['results'],
+            'image_paths': row['image_paths'],
+            'pdf_path': row['pdf_path'],
+            'created_at': row['created_at'].isoformat()
+        }
+    
+    def to_dict(self):
+        return MedicalReport.row_to_dict({
             'id': self.id,
             'case_number': self.case_number,
-            'report_date': self.report_date.isoformat(),
-            'results': {
-                'yeast': {
-                    'present': self.yeast_present,
-                    'count': self.yeast_count,
-                    'confidence': self.yeast_confidence
-                },
-                'triple_phosphate': {
-                    'present': self.triple_phosphate_present,
-                    'count': self.triple_phosphate_count,
-                    'confidence': self.triple_phosphate_confidence
-                },
-                'calcium_oxalate': {
-                    'present': self.calcium_oxalate_present,
-                    'count': self.calcium_oxalate_count,
-                    'confidence': self.calcium_oxalate_confidence
-                },
-                'squamous_cells': {
-                    'present': self.squamous_cells_present,
-                    'count': self.squamous_cells_count,
-                    'confidence': self.squamous_cells_confidence
-                },
-                'uric_acid': {
-                    'present': self.uric_acid_present,
-                    'count': self.uric_acid_count,
-                    'confidence': self.uric_acid_confidence
-                }
-            },
+            'report_date': self.report_date,
+            'results': self.results,
             'image_paths': self.image_paths,
             'pdf_path': self.pdf_path,
-            'created_at': self.created_at.isoformat()
-        }
+            'created_at': self.created_at
+        })
+
+
+# Columns selected by read-only list queries (plain rows, no ORM instances)
+REPORT_LIST_COLUMNS = (
+    MedicalReport.id,
+    MedicalReport.case_number,
+    MedicalReport.report_date,
+    MedicalReport.results,
+    MedicalReport.image_paths,
+    MedicalReport.pdf_path,
+    MedicalReport.created_at
+)
+
+
+# gin_trgm_ops comes from the pg_trgm extension
+event.listen(
+    MedicalReport.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+
+# Header signatures of accepted image formats
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',           # JPEG
+    b'\x89PNG\r\n\x1a\n',      # PNG
+    b'GIF87a', b'GIF89a',      # GIF
+    b'BM',                     # BMP
+    b'II*\x00', b'MM\x00*',    # TIFF
+)
 
 
 def validate_image_file(file_stream):
     """
-    Validate that the file is a valid image using Pillow
+    Validate that the file is an image by checking its magic bytes
+    (pixels are decoded once, later, by the consumer - not here)
     Returns True if valid, False otherwise
     """
     try:
-        from PIL import Image
         # Move pointer to beginning
         file_stream.seek(0)
-        # Try to open and verify
-        img = Image.open(file_stream)
-        img.verify()
+        header = file_stream.read(32)
         # Reset pointer for saving
         file_stream.seek(0)
-        return True
     except Exception:
         return False
+    
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return True
+    return header.startswith(IMAGE_SIGNATURES)
+
+
+def send_sms(to, body):
+    """Send an SMS via Twilio (runs on sms_executor, failures are only logged)"""
+    try:
+        message = twilio_client.messages.create(
+            body=body,
+            from_=app.config['TWILIO_PHONE_NUMBER'],
+            to=to
+        )
+        print(f"📱 SMS sent to {to}: {message.sid}")
+    except Exception as e:
+        print(f"❌ Failed to send SMS: {e}")
+
+
+def send_upload(subdir, filename, mimetype=None):
+    """
+    Send an uploaded file
+    Behind nginx (USE_X_ACCEL_REDIRECT) the body is served by nginx straight from
+    disk via an internal redirect; otherwise Flask sends it with ETag/Last-Modified
+    so repeat requests get a 304
+    """
+    if app.config['USE_X_ACCEL_REDIRECT']:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f'/_protected/{subdir}/{filename}'
+        response.headers['Content-Type'] = (
+            mimetype or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        return response
+    
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], subdir, filename)
+    return send_file(filepath, mimetype=mimetype, conditional=True, etag=True)
+
+
+# Detection result cache (LRU keyed by image content hash, threshold and model version)
+DETECTION_CACHE_SIZE = int(os.environ.get('DETECTION_CACHE_SIZE', 512))
+_detection_cache = OrderedDict()
+_detection_cache_lock = threading.Lock()
+
+
+def _detection_cache_key(image_stream, confidence):
+    """Build cache key for a detection request (hashes the stream in chunks, then rewinds it)"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: image_stream.read(64 * 1024), b''):
+        hasher.update(chunk)
+    image_stream.seek(0)
+    return (hasher.digest(), confidence, get_detector().model_version)
+
+
+def _get_cached_detection(key):
+    """Return cached detection results or None"""
+    with _detection_cache_lock:
+        results = _detection_cache.get(key)
+        if results is not None:
+            _detection_cache.move_to_end(key)
+        return results
+
+
+def _store_cached_detection(key, results):
+    """Store detection results, evicting the least recently used entry"""
+    if DETECTION_CACHE_SIZE <= 0:
+        return
+    with _detection_cache_lock:
+        _detection_cache[key] = results
+        _detection_cache.move_to_end(key)
+        while len(_detection_cache) > DETECTION_CACHE_SIZE:
+            _detection_cache.popitem(last=False)
 
 
 # API Routes
@@ -330,6 +598,9 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Persist the hash if it was upgraded during verification
+        db.session.commit()
+        
         # Generate access token
         access_token = create_access_token(identity=str(user.id))
         
@@ -360,26 +631,14 @@ def forgot_password():
         otp = user.generate_otp()
         db.session.commit()
         
-        # Send OTP via Twilio
-        try:
-            # Print OTP to console for development/testing without credits
-            print(f"🔐 OTP for {user.phone_number}: {otp}")
-            
-            if app.config['TWILIO_ACCOUNT_SID'] and app.config['TWILIO_AUTH_TOKEN']:
-                client = Client(app.config['TWILIO_ACCOUNT_SID'], app.config['TWILIO_AUTH_TOKEN'])
-                message = client.messages.create(
-                    body=f"Your UroSmart reset code is: {otp}",
-                    from_=app.config['TWILIO_PHONE_NUMBER'],
-                    to=user.phone_number
-                )
-                print(f"📱 SMS sent to {user.phone_number}: {message.sid}")
-            else:
-                print("⚠️  Twilio credentials not set. OTP printed to console only.")
-            
-        except Exception as e:
-            print(f"❌ Failed to send SMS: {e}")
-            # Continue anyway so user can use console OTP in dev
-            # In prod, you might want to return error
+        # Print OTP to console for development/testing without credits
+        print(f"🔐 OTP for {user.phone_number}: {otp}")
+        
+        # Send OTP via Twilio in the background (failures are logged by send_sms)
+        if twilio_client is not None:
+            sms_executor.submit(send_sms, user.phone_number, f"Your UroSmart reset code is: {otp}")
+        else:
+            print("⚠️  Twilio credentials not set. OTP printed to console only.")
         
         return jsonify({
             'message': 'OTP sent successfully',
@@ -459,21 +718,7 @@ def create_report():
         report = MedicalReport(
             user_id=user_id,
             case_number=data.get('case_number'),
-            yeast_present=data.get('yeast_present', False),
-            yeast_count=data.get('yeast_count', 0),
-            yeast_confidence=data.get('yeast_confidence', 0.0),
-            triple_phosphate_present=data.get('triple_phosphate_present', False),
-            triple_phosphate_count=data.get('triple_phosphate_count', 0),
-            triple_phosphate_confidence=data.get('triple_phosphate_confidence', 0.0),
-            calcium_oxalate_present=data.get('calcium_oxalate_present', False),
-            calcium_oxalate_count=data.get('calcium_oxalate_count', 0),
-            calcium_oxalate_confidence=data.get('calcium_oxalate_confidence', 0.0),
-            squamous_cells_present=data.get('squamous_cells_present', False),
-            squamous_cells_count=data.get('squamous_cells_count', 0),
-            squamous_cells_confidence=data.get('squamous_cells_confidence', 0.0),
-            uric_acid_present=data.get('uric_acid_present', False),
-            uric_acid_count=data.get('uric_acid_count', 0),
-            uric_acid_confidence=data.get('uric_acid_confidence', 0.0),
+            results=MedicalReport.results_from_fields(data),
             image_paths=data.get('image_paths', '[]'),
             pdf_path=data.get('pdf_path')
         )
@@ -503,24 +748,57 @@ def get_reports():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # Build query
-        query = MedicalReport.query.filter_by(user_id=user_id)
+        # Keyset pagination: ?cursor=<report_date>_<id> of the last row seen&limit=N
+        # (the id breaks ties between reports with the same report_date)
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
+        paginate = cursor is not None or limit is not None
+        if paginate:
+            limit = min(max(limit or REPORTS_PAGE_SIZE, 1), REPORTS_MAX_PAGE_SIZE)
+        
+        if cursor:
+            cursor_date, _, cursor_id = cursor.rpartition('_')
+            try:
+                cursor_date = datetime.fromisoformat(cursor_date)
+                cursor_id = int(cursor_id)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        
+        # Build query: a column projection, so rows come back as plain mappings
+        # without ORM instance hydration or identity-map bookkeeping
+        query = select(*REPORT_LIST_COLUMNS).where(MedicalReport.user_id == user_id)
         
         if case_number:
-            query = query.filter(MedicalReport.case_number.contains(case_number))
+            query = query.where(MedicalReport.case_number.contains(case_number))
         
         if start_date:
-            query = query.filter(MedicalReport.report_date >= datetime.fromisoformat(start_date))
+            query = query.where(MedicalReport.report_date >= datetime.fromisoformat(start_date))
         
         if end_date:
-            query = query.filter(MedicalReport.report_date <= datetime.fromisoformat(end_date))
+            query = query.where(MedicalReport.report_date <= datetime.fromisoformat(end_date))
         
-        # Order by date descending
-        reports = query.order_by(MedicalReport.report_date.desc()).all()
+        if cursor:
+            query = query.where(
+                tuple_(MedicalReport.report_date, MedicalReport.id) < (cursor_date, cursor_id)
+            )
+        
+        # Order by date descending (newest id first within the same date)
+        query = query.order_by(MedicalReport.report_date.desc(), MedicalReport.id.desc())
+        if paginate:
+            # One extra row tells us whether another page exists
+            query = query.limit(limit + 1)
+        
+        reports = db.session.execute(query).mappings().all()
+        
+        next_cursor = None
+        if paginate and len(reports) > limit:
+            reports = reports[:limit]
+            next_cursor = f"{reports[-1]['report_date'].isoformat()}_{reports[-1]['id']}"
         
         return jsonify({
-            'reports': [report.to_dict() for report in reports],
-            'count': len(reports)
+            'reports': [MedicalReport.row_to_dict(report) for report in reports],
+            'count': len(reports),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -610,7 +888,7 @@ def get_image(filename):
         if not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        return send_file(filepath)
+        return send_upload('images', filename)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -627,7 +905,7 @@ def get_pdf_report(filename):
         if not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        return send_file(filepath, mimetype='application/pdf')
+        return send_upload('reports', filename, mimetype='application/pdf')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -670,19 +948,30 @@ def detect_microscopy_objects():
         # Get confidence threshold
         confidence = float(request.form.get('confidence', 0.15))
         
-        # Read image data
-        image_data = file.read()
+        # Identical uploads (UI retries, shared samples) skip inference entirely
+        cache_key = _detection_cache_key(file.stream, confidence)
+        results = _get_cached_detection(cache_key)
+        cache_status = 'HIT'
         
-        # Run detection
-        results = detect_objects(image_data, confidence_threshold=confidence)
-        
-        if 'error' in results:
-            return jsonify(results), 500
+        if results is None:
+            cache_status = 'MISS'
+            
+            # Run detection (the upload stream is decoded directly, no extra bytes copy);
+            # off the event loop under gevent, invoke() releases the GIL so pooled
+            # interpreters run in parallel
+            results = run_cpu_bound(detect_objects, file.stream, confidence_threshold=confidence)
+            
+            if 'error' in results:
+                return jsonify(results), 500
+            
+            _store_cached_detection(cache_key, results)
         
-        return jsonify({
+        response = jsonify({
             'message': 'Detection completed',
             'detection_results': results
-        }), 200
+        })
+        response.headers['X-Cache'] = cache_status
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -697,7 +986,7 @@ def detection_status():
             return jsonify({
                 'available': detector.interpreter is not None,
                 'backend': 'TensorFlow Lite',
-                'model': 'best.tflite',
+                'model': os.path.basename(detector.model_path),
                 'unified_format': True,
                 'message': 'TFLite detection available (same model as iOS)'
             }), 200
@@ -753,9 +1042,13 @@ def submit_model_update():
             timestamp=datetime.utcnow().isoformat()
         )
         
-        # Add update (automatically processes if online)
+        # Add update (automatically processes if online); rejects layers that
+        # don't match the pending updates
         manager = get_federated_manager()
-        result = manager.add_update(update)
+        try:
+            result = manager.add_update(update)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify(result), 200
         
@@ -794,10 +1087,16 @@ def get_latest_model():
                 'message': 'Model available but device is offline'
             }), 200
         
+        # int8-quantized weights by default, ?precision=fp32 for full precision
+        precision = request.args.get('precision', 'int8')
+        if precision not in ('int8', 'fp32'):
+            return jsonify({'error': "precision must be 'int8' or 'fp32'"}), 400
+        
         return jsonify({
             'model_available': True,
             'version': global_model.version,
-            'weights': global_model.weights,
+            'precision': precision,
+            'weights': manager.get_model_weights(global_model, precision),
             'aggregation_timestamp': global_model.aggregation_timestamp,
             'participating_devices': global_model.participating_devices,
             'average_accuracy': global_model.average_accuracy
@@ -843,20 +1142,12 @@ def check_model_updates():
         return jsonify({'error': str(e)}), 500
 
 
-# Database initialization
-@app.before_request
-def create_tables():
-    """Create database tables if they don't exist"""
-    if not hasattr(app, 'tables_created'):
-        db.create_all()
-        app.tables_created = True
+# Database initialization (once at startup, not on the request path)
+with app.app_context():
+    db.create_all()
 
 
 if __name__ == '__main__':
-    # Create tables
-    with app.app_context():
-        db.create_all()
-    
     # Run server
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
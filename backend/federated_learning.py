@@ -6,20 +6,49 @@ Works seamlessly based on internet connectivity - no user configuration needed
 
 import os
 import json
+import shutil
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import Deque, Dict, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, fields
 import threading
 import time
 import socket
-import requests
+
+# orjson reads/writes the metadata files faster (stdlib json used if not installed)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# flock keeps server worker processes out of each other's pending sums (no fcntl on
+# Windows, where the development server runs a single process)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
 
 # Configuration (invisible to users - automatic behavior)
 AGGREGATION_THRESHOLD = 3  # Minimum updates before aggregation
 AGGREGATION_INTERVAL = 1800  # Aggregate every 30 minutes if threshold not met
 MODEL_STORAGE_PATH = 'federated_models'
-CHECK_INTERNET_INTERVAL = 60  # Check internet every minute
+CHECK_INTERNET_INTERVAL = 30  # Check internet every 30 seconds
+CONNECTIVITY_PROBE_HOSTS = (("8.8.8.8", 53), ("1.1.1.1", 53))  # Public DNS resolvers
+
+# Running FedAvg sums of pending updates are memory-mapped files (survive restarts) in
+# a pending_<slot> directory per manager: each server worker process holds an exclusive
+# lock on pending_<slot>.lock, so no two processes ever map the same files. The sums
+# move to pending_<slot>_aggregating while an aggregation round is using them.
+PENDING_SLOT_PREFIX = os.path.join(MODEL_STORAGE_PATH, 'pending_')
+
+# Layers are independent in FedAvg: large models are processed one layer per thread
+# (NumPy releases the GIL); below this size the thread hand-off costs more than it saves
+LAYER_PARALLEL_MIN_PARAMS = 1 << 20
+_layer_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='fedavg')
 
 
 @dataclass
@@ -27,18 +56,26 @@ class ModelUpdate:
     """Represents a model update from a client device"""
     device_id: str
     version: int
-    weight_updates: Dict[str, List[float]]
+    weight_updates: Dict[str, np.ndarray]  # Lists from JSON are accepted and converted
     num_samples: int
     training_loss: float
     validation_accuracy: float
     timestamp: str
+    
+    def __post_init__(self):
+        # Parse each layer into a float32 array once, at ingestion, instead of on
+        # every aggregation round
+        self.weight_updates = {
+            key: np.asarray(value, dtype=np.float32)
+            for key, value in self.weight_updates.items()
+        }
 
 
 @dataclass
 class GlobalModel:
     """Represents the global aggregated model"""
     version: int
-    weights: Dict[str, List[float]]
+    weights: Dict[str, np.ndarray]  # float32 arrays per layer
     participating_devices: int
     aggregation_timestamp: str
     average_loss: float
@@ -47,41 +84,116 @@ class GlobalModel:
 
 def check_internet_connection() -> bool:
     """Check if internet connection is available"""
-    try:
-        # Quick check with socket (faster than HTTP)
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
-        return True
-    except OSError:
-        pass
+    # Quick TCP connect to a DNS resolver (a second one in case the first is blocked)
+    for address in CONNECTIVITY_PROBE_HOSTS:
+        try:
+            with socket.create_connection(address, timeout=3):
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def _map_layers(function, keys, num_params: int) -> Dict[str, np.ndarray]:
+    """Apply function(key) to every layer, in parallel for large models"""
+    if num_params < LAYER_PARALLEL_MIN_PARAMS:
+        return {key: function(key) for key in keys}
+    return dict(zip(keys, _layer_executor.map(function, keys)))
+
+
+def _quantize(values: np.ndarray) -> Tuple[np.ndarray, float, int]:
+    """
+    Affine int8 quantization of a layer: values ~= (q - zero_point) * scale
     
+    The range always includes 0 so zero weights stay exact.
+    """
+    low = min(float(values.min(initial=0.0)), 0.0)
+    high = max(float(values.max(initial=0.0)), 0.0)
+    scale = (high - low) / 255 or 1.0
+    zero_point = int(round(-128 - low / scale))
+    quantized = np.clip(np.rint(values / scale) + zero_point, -128, 127).astype(np.int8)
+    return quantized, scale, zero_point
+
+
+def _write_json(path: str, data):
+    """Write JSON compactly (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+
+def _read_json(path: str):
+    """Read a JSON file (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _replace_with_link(source: str, destination: str):
+    """Atomically point destination at source (hard link, copy if links are unsupported)"""
+    temp_path = destination + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
     try:
-        # Fallback: HTTP check
-        requests.get("https://www.google.com", timeout=3)
-        return True
-    except (requests.RequestException, Exception):
-        return False
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
 
 
 class FederatedLearningManager:
     """Manages federated learning aggregation automatically"""
     
     def __init__(self):
-        self.pending_updates: List[ModelUpdate] = []
+        self.pending_updates: Deque[ModelUpdate] = deque()
+        # Running FedAvg sums (num_samples * weights per layer) of the pending updates,
+        # memory-mapped from this manager's pending directory; pending_updates itself only keeps each update's metadata
+        self._accumulators: Dict[str, np.ndarray] = {}
+        self._accumulator_files: Dict[str, str] = {}
+        self._acc_samples = 0
+        # Layer shapes / parameter count of the sums, recorded once when they are created
+        self._layer_shapes: Dict[str, tuple] = {}
+        self._layer_params = 0
+        # Per-layer scratch for num_samples * weights; the architecture rarely changes, so
+        # these are allocated once and reused across updates and rounds
+        self._scratch: Dict[str, np.ndarray] = {}
+        # (global model, its int8 weights): quantized once per model version for downloads
+        self._quantized: Optional[Tuple[GlobalModel, Dict]] = None
         self.current_version = 0
         self.global_model: Optional[GlobalModel] = None
+        # Guards swapping out pending_updates and aggregation_in_progress only; readers
+        # never take it (global_model is published by a single attribute assignment)
         self.lock = threading.Lock()
+        self.aggregation_in_progress = False
+        # Set when pending updates reach the threshold; wakes the aggregation thread
+        self._aggregate_event = threading.Event()
         self.is_online = False
         self.last_online_check = 0
         
         # Ensure storage directory exists
         os.makedirs(MODEL_STORAGE_PATH, exist_ok=True)
         
-        # Load existing global model
+        # This process's pending directory (the lock is held for the manager's lifetime)
+        self._pending_slot, self._pending_lock_file = self._claim_pending_slot()
+        self._pending_path = f'{PENDING_SLOT_PREFIX}{self._pending_slot}'
+        self._aggregating_path = f'{self._pending_path}_aggregating'
+        
+        # Load existing global model and the updates pending before a restart
         self.load_global_model()
+        self._load_pending()
+        
+        # Probe once before accepting updates: the manager is created by the first
+        # update request, which would otherwise always see is_online == False
+        self.refresh_connectivity()
         
         # Start background threads
         self.aggregation_thread = threading.Thread(
-            target=self._periodic_aggregation, 
+            target=self._aggregation_worker,
             daemon=True
         )
         self.aggregation_thread.start()
@@ -93,24 +205,23 @@ class FederatedLearningManager:
         self.connectivity_thread.start()
     
     def _monitor_connectivity(self):
-        """Monitor internet connectivity in background"""
+        """Monitor internet connectivity in background (probes after the startup one)"""
         while True:
-            time.sleep(CHECK_INTERNET_INTERVAL)
-            self.is_online = check_internet_connection()
-            self.last_online_check = time.time()
-            
             # If came back online and have pending updates, try to aggregate
             if self.is_online and len(self.pending_updates) >= AGGREGATION_THRESHOLD:
-                with self.lock:
-                    if len(self.pending_updates) >= AGGREGATION_THRESHOLD:
-                        self._aggregate_updates()
+                self._aggregate_event.set()
+            
+            time.sleep(CHECK_INTERNET_INTERVAL)
+            self.refresh_connectivity()
+    
+    def refresh_connectivity(self) -> bool:
+        """Probe the network now (at startup, then from the monitor thread only)"""
+        self.is_online = check_internet_connection()
+        self.last_online_check = time.time()
+        return self.is_online
     
     def is_connected(self) -> bool:
-        """Check if currently connected to internet"""
-        # Cache check for 30 seconds
-        if time.time() - self.last_online_check > 30:
-            self.is_online = check_internet_connection()
-            self.last_online_check = time.time()
+        """Check if currently connected to internet (as last seen by the monitor thread)"""
         return self.is_online
     
     def add_update(self, update: ModelUpdate) -> Dict:
@@ -120,79 +231,281 @@ class FederatedLearningManager:
         Returns:
             Dict with status and response info
         """
+        # Only accept updates if online
+        if not self.is_connected():
+            return {
+                'status': 'offline',
+                'message': 'Update queued for when connection is available',
+                'queued': True
+            }
+        
+        # The lock only covers adding the update into the running sums; aggregation
+        # runs on the aggregation thread
         with self.lock:
-            # Only accept updates if online
-            if not self.is_connected():
-                return {
-                    'status': 'offline',
-                    'message': 'Update queued for when connection is available',
-                    'queued': True
-                }
-            
+            self._accumulate(update)
             self.pending_updates.append(update)
-            
-            # Auto-aggregate if threshold reached
-            if len(self.pending_updates) >= AGGREGATION_THRESHOLD:
-                result = self._aggregate_updates()
-                return {
-                    'status': 'aggregated',
-                    'message': 'Update received and aggregated',
-                    'new_version': self.current_version,
-                    'pending_count': 0
-                }
-            else:
-                return {
-                    'status': 'pending',
-                    'message': f'Update received ({len(self.pending_updates)}/{AGGREGATION_THRESHOLD} pending)',
-                    'pending_count': len(self.pending_updates),
-                    'threshold': AGGREGATION_THRESHOLD
-                }
+            self._save_pending_state()
+            pending_count = len(self.pending_updates)
+        
+        # Auto-aggregate if threshold reached
+        if pending_count >= AGGREGATION_THRESHOLD:
+            self._aggregate_event.set()
+            return {
+                'status': 'aggregating',
+                'message': 'Update received, aggregation started',
+                'current_version': self.current_version,
+                'pending_count': pending_count
+            }
+        
+        return {
+            'status': 'pending',
+            'message': f'Update received ({pending_count}/{AGGREGATION_THRESHOLD} pending)',
+            'pending_count': pending_count,
+            'threshold': AGGREGATION_THRESHOLD
+        }
     
-    def _aggregate_updates(self) -> bool:
-        """Perform Federated Averaging on pending updates (FedAvg algorithm)"""
-        if len(self.pending_updates) == 0:
-            return False
+    def _accumulate(self, update: ModelUpdate):
+        """Add an update's sample-weighted layers to the running sums (lock held)"""
+        # One dict comparison validates every layer name and shape
+        shapes = {key: value.shape for key, value in update.weight_updates.items()}
+        if not self._accumulators:
+            # First update since the last aggregation: create the (zero-filled) sums
+            for key, shape in shapes.items():
+                self._create_accumulator(key, shape)
+        elif shapes != self._layer_shapes:
+            raise ValueError("Update layers or shapes don't match the pending updates")
         
-        # Must be online to aggregate
-        if not self.is_connected():
-            return False
+        weight = np.float32(update.num_samples)
+        
+        def add_layer(key):
+            scaled = np.multiply(update.weight_updates[key], weight, out=self._scratch[key])
+            self._accumulators[key] += scaled
+        
+        _map_layers(add_layer, shapes, self._layer_params)
+        self._acc_samples += update.num_samples
+        
+        # The weights now live in the sums, don't keep them around until aggregation
+        update.weight_updates = {}
+    
+    def _create_accumulator(self, key: str, shape) -> np.ndarray:
+        """Create the memory-mapped running sum for a layer (lock held)"""
+        os.makedirs(self._pending_path, exist_ok=True)
+        filename = f'acc_{len(self._accumulator_files)}.f32'
+        self._accumulator_files[key] = filename
+        # 'w+' truncates: only ever done in the directory this process holds the lock on
+        self._accumulators[key] = self._open_accumulator(self._pending_path, filename, shape, 'w+')
+        self._layer_shapes[key] = self._accumulators[key].shape
+        self._layer_params += self._accumulators[key].size
+        if key not in self._scratch or self._scratch[key].shape != self._layer_shapes[key]:
+            self._scratch[key] = np.empty(self._layer_shapes[key], dtype=np.float32)
+        return self._accumulators[key]
+    
+    @staticmethod
+    def _open_accumulator(directory: str, filename: str, shape, mode: str) -> np.ndarray:
+        """Map an accumulator file (empty layers can't be mapped and stay in memory)"""
+        shape = tuple(shape)
+        if np.prod(shape, dtype=np.int64) == 0:
+            return np.zeros(shape, dtype=np.float32)
+        return np.memmap(os.path.join(directory, filename), dtype=np.float32, mode=mode, shape=shape)
+    
+    def _save_pending_state(self):
+        """Write the pending metadata sidecar atomically (write temp + rename, lock held)"""
+        os.makedirs(self._pending_path, exist_ok=True)
+        state = {
+            'acc_samples': self._acc_samples,
+            'layers': {
+                key: {'file': filename, 'shape': list(self._accumulators[key].shape)}
+                for key, filename in self._accumulator_files.items()
+            },
+            'updates': [asdict(update) for update in self.pending_updates]
+        }
+        
+        state_path = os.path.join(self._pending_path, 'state.json')
+        _write_json(state_path + '.tmp', state)
+        os.replace(state_path + '.tmp', state_path)
+    
+    def _read_pending_dir(self, directory: str):
+        """Load a pending directory as (updates, sums, total_samples), or None if incomplete"""
+        state_path = os.path.join(directory, 'state.json')
+        if not os.path.exists(state_path):
+            return None
+        
+        state = _read_json(state_path)
         
+        updates = deque(ModelUpdate(**data) for data in state['updates'])
+        sums = {
+            key: self._open_accumulator(directory, layer['file'], layer['shape'], 'r+')
+            for key, layer in state['layers'].items()
+        }
+        files = {key: layer['file'] for key, layer in state['layers'].items()}
+        return updates, sums, state['acc_samples'], files
+    
+    @staticmethod
+    def _try_lock(lock_file) -> bool:
+        """Take an exclusive lock on an open file without blocking"""
+        if not FCNTL_AVAILABLE:
+            return True
         try:
-            # Calculate weighted average of model updates
-            aggregated_weights = {}
-            total_samples = sum(update.num_samples for update in self.pending_updates)
-            
-            if total_samples == 0:
-                return False
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+    
+    def _claim_pending_slot(self):
+        """Lock the first pending slot no other manager holds, as (slot, open lock file)"""
+        slot = 0
+        while True:
+            lock_file = open(f'{PENDING_SLOT_PREFIX}{slot}.lock', 'a')
+            if self._try_lock(lock_file):
+                return slot, lock_file
+            lock_file.close()
+            slot += 1
+    
+    def _orphaned_slots(self):
+        """Lock the other pending slots whose process is gone, as (slot, open lock file)"""
+        slots = []
+        prefix = os.path.basename(PENDING_SLOT_PREFIX)
+        for filename in os.listdir(MODEL_STORAGE_PATH):
+            slot = filename[len(prefix):-len('.lock')]
+            if not (filename.startswith(prefix) and filename.endswith('.lock') and slot.isdigit()):
+                continue
+            if int(slot) == self._pending_slot:
+                continue
+            lock_file = open(os.path.join(MODEL_STORAGE_PATH, filename), 'a')
+            if self._try_lock(lock_file):
+                slots.append((int(slot), lock_file))
+            else:
+                lock_file.close()
+        return slots
+    
+    def _load_pending(self):
+        """Reopen the accumulators of updates that were pending before a restart"""
+        try:
+            with self.lock:
+                current = self._read_pending_dir(self._pending_path)
+                if current is not None:
+                    self.pending_updates, self._accumulators, self._acc_samples, self._accumulator_files = current
+                    self._layer_shapes = {key: value.shape for key, value in self._accumulators.items()}
+                    self._layer_params = sum(value.size for value in self._accumulators.values())
+                    self._scratch = {
+                        key: np.empty(shape, dtype=np.float32) for key, shape in self._layer_shapes.items()
+                    }
+                
+                # Interrupted aggregation round: its updates are still pending
+                interrupted = self._read_pending_dir(self._aggregating_path)
+                if interrupted is not None:
+                    self._restore_pending(*interrupted[:3])
+                shutil.rmtree(self._aggregating_path, ignore_errors=True)
+                
+                # Take over the updates of worker processes that are gone (e.g. fewer
+                # workers after a restart) so they aren't stranded in their slots
+                for slot, lock_file in self._orphaned_slots():
+                    try:
+                        for directory in (f'{PENDING_SLOT_PREFIX}{slot}', f'{PENDING_SLOT_PREFIX}{slot}_aggregating'):
+                            orphaned = self._read_pending_dir(directory)
+                            if orphaned is not None:
+                                self._restore_pending(*orphaned[:3])
+                            shutil.rmtree(directory, ignore_errors=True)
+                    finally:
+                        lock_file.close()
             
-            # Get all weight keys from first update
-            if len(self.pending_updates) == 0:
+            if self.pending_updates:
+                print(f"✅ Restored {len(self.pending_updates)} pending federated updates")
+        except Exception as e:
+            print(f"⚠️  Error loading pending updates: {e}")
+    
+    def _take_pending(self):
+        """Detach the pending updates and their sums (lock held)"""
+        snapshot = (self.pending_updates, self._accumulators, self._acc_samples)
+        self.pending_updates = deque()
+        self._accumulators = {}
+        self._accumulator_files = {}
+        self._acc_samples = 0
+        self._layer_shapes = {}
+        self._layer_params = 0
+        
+        # Mapped files keep working after the move; new updates start a fresh pending directory
+        shutil.rmtree(self._aggregating_path, ignore_errors=True)
+        if os.path.exists(self._pending_path):
+            os.replace(self._pending_path, self._aggregating_path)
+        return snapshot
+    
+    def _restore_pending(self, updates: Deque[ModelUpdate], sums: Dict[str, np.ndarray], total_samples: int):
+        """Put a detached snapshot back in front of the pending updates (lock held)"""
+        shapes = {key: value.shape for key, value in sums.items()}
+        if self._accumulators and shapes != self._layer_shapes:
+            # Can't be summed with the pending updates (the architecture changed)
+            print(f"⚠️  Dropping {len(updates)} federated updates: layers don't match the pending updates")
+            return
+        
+        self.pending_updates.extendleft(reversed(updates))
+        for key, value in sums.items():
+            if key in self._accumulators:
+                self._accumulators[key] += value
+            else:
+                self._create_accumulator(key, value.shape)[...] = value
+        self._acc_samples += total_samples
+        self._save_pending_state()
+    
+    def _aggregate_updates(self) -> bool:
+        """
+        Aggregate pending updates: snapshot them under the lock, then do the
+        NumPy work and disk I/O outside it. Overlapping triggers coalesce into
+        the running aggregation.
+        """
+        with self.lock:
+            # Must be online to aggregate
+            if self.aggregation_in_progress or not self.pending_updates or not self.is_connected():
                 return False
+            self.aggregation_in_progress = True
+            snapshot = self._take_pending()
+        
+        aggregated = False
+        while True:
+            success = self._aggregate_snapshot(*snapshot)
+            aggregated = aggregated or success
             
-            weight_keys = self.pending_updates[0].weight_updates.keys()
-            
-            for key in weight_keys:
-                # Weighted average based on number of training samples (FedAvg)
-                first_weights = np.array(self.pending_updates[0].weight_updates[key])
-                weighted_sum = np.zeros_like(first_weights, dtype=np.float64)
+            with self.lock:
+                if not success:
+                    # Keep the updates for the next attempt
+                    self._restore_pending(*snapshot)
+                snapshot = None
+                shutil.rmtree(self._aggregating_path, ignore_errors=True)
                 
-                for update in self.pending_updates:
-                    weight = update.num_samples / total_samples
-                    update_weights = np.array(update.weight_updates[key], dtype=np.float64)
-                    weighted_sum += update_weights * weight
+                if not success or len(self.pending_updates) < AGGREGATION_THRESHOLD:
+                    self.aggregation_in_progress = False
+                    return aggregated
                 
-                aggregated_weights[key] = weighted_sum.tolist()
+                # Threshold reached again while aggregating: go another round
+                snapshot = self._take_pending()
+    
+    def _aggregate_snapshot(self, updates: Deque[ModelUpdate], sums: Dict[str, np.ndarray],
+                            total_samples: int) -> bool:
+        """Perform Federated Averaging on a snapshot of updates (FedAvg algorithm)"""
+        if not updates or total_samples == 0:
+            return False
+        
+        try:
+            # Weighted average of model updates: the sums already hold
+            # num_samples * weights per client, so FedAvg is one division per layer
+            divisor = np.float32(total_samples)
+            num_params = sum(value.size for value in sums.values())
+            aggregated_weights = _map_layers(lambda key: sums[key] / divisor, sums, num_params)
             
-            # Calculate average metrics
-            avg_loss = np.mean([u.training_loss for u in self.pending_updates])
-            avg_accuracy = np.mean([u.validation_accuracy for u in self.pending_updates])
+            # Calculate average metrics (weighted by samples, like the weights) in one pass
+            total_loss = total_accuracy = 0.0
+            for u in updates:
+                total_loss += u.num_samples * u.training_loss
+                total_accuracy += u.num_samples * u.validation_accuracy
+            avg_loss = total_loss / total_samples
+            avg_accuracy = total_accuracy / total_samples
             
             # Create new global model
             self.current_version += 1
             self.global_model = GlobalModel(
                 version=self.current_version,
                 weights=aggregated_weights,
-                participating_devices=len(self.pending_updates),
+                participating_devices=len(updates),
                 aggregation_timestamp=datetime.utcnow().isoformat(),
                 average_loss=float(avg_loss),
                 average_accuracy=float(avg_accuracy)
@@ -201,10 +514,6 @@ class FederatedLearningManager:
             # Save global model
             self.save_global_model()
             
-            # Clear pending updates
-            pending_count = len(self.pending_updates)
-            self.pending_updates.clear()
-            
             # Update backend model if available
             self._update_backend_model()
             
@@ -229,46 +538,81 @@ class FederatedLearningManager:
             # Silently fail - not critical if detector update fails
             pass
     
-    def _periodic_aggregation(self):
-        """Background thread for periodic aggregation"""
+    def _aggregation_worker(self):
+        """
+        Background thread: aggregates as soon as the threshold is signalled, and
+        every AGGREGATION_INTERVAL aggregates whatever is pending
+        """
+        next_periodic = time.monotonic() + AGGREGATION_INTERVAL
         while True:
-            time.sleep(AGGREGATION_INTERVAL)
+            triggered = self._aggregate_event.wait(timeout=max(0, next_periodic - time.monotonic()))
+            self._aggregate_event.clear()
             
-            with self.lock:
-                if self.is_connected() and len(self.pending_updates) >= AGGREGATION_THRESHOLD:
-                    self._aggregate_updates()
-                elif len(self.pending_updates) > 0 and self.is_connected():
-                    # If we have updates and just came online, try to aggregate
-                    self._aggregate_updates()
+            if not triggered:
+                next_periodic = time.monotonic() + AGGREGATION_INTERVAL
+            
+            # Periodic round: even below the threshold
+            if self.is_connected() and len(self.pending_updates) > 0:
+                self._aggregate_updates()
     
     def get_global_model(self) -> Optional[GlobalModel]:
         """Get current global model"""
-        with self.lock:
-            return self.global_model
+        return self.global_model
     
-    def get_latest_model_weights(self) -> Optional[Dict]:
+    def get_latest_model_weights(self, precision: str = 'int8') -> Optional[Dict]:
         """Get latest model weights for clients to download"""
         model = self.get_global_model()
         if model:
-            return model.weights
+            return self.get_model_weights(model, precision)
         return None
     
+    def get_model_weights(self, model: GlobalModel, precision: str = 'int8') -> Dict:
+        """
+        Weights of a global model for download: 'fp32' arrays, or by default 'int8'
+        as {layer: {'values', 'scale', 'zero_point'}} (~4x smaller payload)
+        """
+        if precision == 'fp32':
+            return model.weights
+        
+        cached = self._quantized
+        if cached is None or cached[0] is not model:
+            quantized = {}
+            for key, value in model.weights.items():
+                values, scale, zero_point = _quantize(np.asarray(value, dtype=np.float32))
+                quantized[key] = {'values': values, 'scale': scale, 'zero_point': zero_point}
+            cached = self._quantized = (model, quantized)
+        return cached[1]
+    
     def save_global_model(self):
         """Save global model to disk"""
         if self.global_model is None:
             return
         
         try:
-            filepath = os.path.join(MODEL_STORAGE_PATH, f'global_model_v{self.current_version}.json')
+            # Weights go to a compressed float32 .npz, the JSON sidecar only holds metadata
+            weights = {
+                key: np.asarray(value, dtype=np.float32)
+                for key, value in self.global_model.weights.items()
+            }
+            # Read the scalar fields directly (asdict would deep-copy every weight array)
+            metadata = {
+                field.name: getattr(self.global_model, field.name)
+                for field in fields(GlobalModel) if field.name != 'weights'
+            }
             
-            with open(filepath, 'w') as f:
-                json.dump(asdict(self.global_model), f, indent=2)
+            # Written once under the versioned name; "latest" is a hard link to it
+            filepath = os.path.join(MODEL_STORAGE_PATH, f'global_model_v{self.current_version}')
+            latest_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest')
+            
+            with open(filepath + '.npz.tmp', 'wb') as f:
+                np.savez_compressed(f, **weights)
+            os.replace(filepath + '.npz.tmp', filepath + '.npz')
+            _write_json(filepath + '.json.tmp', metadata)
+            os.replace(filepath + '.json.tmp', filepath + '.json')
+            
+            for extension in ('.npz', '.json'):
+                _replace_with_link(filepath + extension, latest_path + extension)
             
-            # Also save as latest
-            latest_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest.json')
-            with open(latest_path, 'w') as f:
-                json.dump(asdict(self.global_model), f, indent=2)
-                
         except Exception as e:
             print(f"❌ Error saving global model: {e}")
     
@@ -278,28 +622,39 @@ class FederatedLearningManager:
         
         if os.path.exists(latest_path):
             try:
-                with open(latest_path, 'r') as f:
-                    data = json.load(f)
-                    self.global_model = GlobalModel(**data)
-                    self.current_version = self.global_model.version
+                data = _read_json(latest_path)
+                
+                if 'weights' in data:
+                    # Models saved before the .npz format keep their weights in the JSON
+                    data['weights'] = {
+                        key: np.asarray(value, dtype=np.float32)
+                        for key, value in data['weights'].items()
+                    }
+                else:
+                    with np.load(latest_path[:-len('.json')] + '.npz') as weights:
+                        data['weights'] = {key: weights[key] for key in weights.files}
+                
+                self.global_model = GlobalModel(**data)
+                self.current_version = self.global_model.version
             except Exception as e:
                 print(f"⚠️  Error loading global model: {e}")
                 self.global_model = None
     
     def get_status(self) -> Dict:
         """Get federated learning status (for internal use only)"""
-        with self.lock:
-            return {
-                'online': self.is_connected(),
-                'current_version': self.current_version,
-                'pending_updates': len(self.pending_updates),
-                'has_global_model': self.global_model is not None,
-                'last_aggregation': self.global_model.aggregation_timestamp if self.global_model else None
-            }
+        global_model = self.global_model
+        return {
+            'online': self.is_connected(),
+            'current_version': self.current_version,
+            'pending_updates': len(self.pending_updates),
+            'has_global_model': global_model is not None,
+            'last_aggregation': global_model.aggregation_timestamp if global_model else None
+        }
 
 
 # Global federated learning manager instance
 _federated_manager: Optional[FederatedLearningManager] = None
+_federated_manager_lock = threading.Lock()
 
 
 def get_federated_manager() -> FederatedLearningManager:
@@ -307,7 +662,10 @@ def get_federated_manager() -> FederatedLearningManager:
     global _federated_manager
     
     if _federated_manager is None:
-        _federated_manager = FederatedLearningManager()
+        # Concurrent first requests must not start a second manager (and probe threads)
+        with _federated_manager_lock:
+            if _federated_manager is None:
+                _federated_manager = FederatedLearningManager()
     
     return _federated_manager
 
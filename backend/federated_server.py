@@ -2,36 +2,90 @@
 Federated Learning Aggregation Server for UroSmart
 Implements Federated Averaging (FedAvg) algorithm with YOLO model support
 Works offline - no internet connection required
+
+Production: gunicorn -k gthread --workers 1 --threads 8 -b 0.0.0.0:5001 federated_server:app
+(one worker: the aggregator state lives in-process; threads parse uploads in parallel)
 """
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 import numpy as np
 from datetime import datetime
+import base64
+import io
 import json
 import os
 import shutil
-from typing import List, Dict, Optional
+import atexit
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 import threading
 import time
 
 # Try to import YOLO for model handling
 try:
+    import torch
     from ultralytics import YOLO
     YOLO_AVAILABLE = True
 except ImportError:
     YOLO_AVAILABLE = False
 
+# Optional: clients may upload plain tensor files instead of full YOLO checkpoints
+try:
+    from safetensors.torch import load_file as load_safetensors
+    SAFETENSORS_AVAILABLE = True
+except ImportError:
+    SAFETENSORS_AVAILABLE = False
+
+# orjson serializes the metadata files faster (stdlib json used if not installed)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Stream-parse uploads (C backend only; the pure-Python one is slower than json for float lists)
+try:
+    import ijson.backends.yajl2_c as ijson
+    from ijson.common import JSONError
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Cython lock with a cheaper uncontended acquire for the per-request critical sections
+try:
+    from fastrlock.rlock import FastRLock as AggregatorLock
+except ImportError:
+    AggregatorLock = threading.Lock
+
+# bfloat16 weight buffers need ml_dtypes (float32/float16/int8 work without it)
+WEIGHT_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+try:
+    from ml_dtypes import bfloat16
+    WEIGHT_DTYPES['bfloat16'] = bfloat16
+except ImportError:
+    pass
+
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('FEDERATED_MAX_UPLOAD_MB', 256)) * 1024 * 1024
 CORS(app)
 
 # Configuration
 AGGREGATION_THRESHOLD = 3  # Minimum number of updates before aggregation (reduced for offline)
 AGGREGATION_INTERVAL = 1800  # Aggregate every 30 minutes (in seconds)
+MAX_AGGREGATION_ATTEMPTS = 3  # Failed rounds in a row before the pending updates are dropped
+AGGREGATION_RETRY_DELAY = 60  # Seconds before uploads re-trigger a failed aggregation (doubles per failure)
 MODEL_STORAGE_PATH = 'federated_models'
 BACKEND_MODELS_PATH = 'models'
 INITIAL_MODEL_PATH = os.path.join(BACKEND_MODELS_PATH, 'best.pt')
+HISTORY_PATH = os.path.join(MODEL_STORAGE_PATH, 'history.jsonl')  # one summary line per version
+
+# Keys are reduced independently: large models fan out one key per thread (NumPy releases
+# the GIL, and free-threaded CPython 3.13t+ runs the Python glue in parallel too)
+KEY_PARALLEL_MIN_PARAMS = 1 << 20
+_key_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='fedavg')
 
 # Ensure storage directory exists
 os.makedirs(MODEL_STORAGE_PATH, exist_ok=True)
@@ -43,7 +97,7 @@ class ModelUpdate:
     """Represents a model update from a client device"""
     device_id: str
     version: int
-    weight_updates: Dict[str, List[float]]
+    weight_updates: Dict[str, Any]  # float32 arrays per layer, 'model_path' for YOLO
     num_samples: int
     training_loss: float
     validation_accuracy: float
@@ -61,14 +115,197 @@ class GlobalModel:
     average_accuracy: float
 
 
+def decode_weight_updates(weight_updates: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert every layer to a float32 ndarray once, at ingress. Plain lists are
+    converted directly; binary buffers {'dtype', 'shape', 'data': base64 little-endian
+    bytes} are decoded with np.frombuffer. int8 buffers also carry 'scale' (and
+    optionally 'zero_point') and are dequantized as (value - zero_point) * scale.
+    'model_path' is passed through.
+    """
+    decoded = {}
+    # Pop as we go so each encoded layer is freed once its array exists
+    for key in list(weight_updates):
+        value = weight_updates.pop(key)
+        if isinstance(value, dict):
+            dtype = WEIGHT_DTYPES.get(value.get('dtype', 'float32'))
+            if dtype is None:
+                raise ValueError(f"Unsupported dtype for {key}: {value.get('dtype')}")
+            buffer = np.frombuffer(base64.b64decode(value['data']), dtype=np.dtype(dtype).newbyteorder('<'))
+            weights = buffer.reshape(value['shape']).astype(np.float32)
+            if dtype is np.int8:
+                weights = (weights - value.get('zero_point', 0)) * np.float32(value['scale'])
+            value = weights
+        elif isinstance(value, list):
+            value = np.asarray(value, dtype=np.float32)
+        decoded[key] = value
+    return decoded
+
+
+def _load_state_dict(path: str, device: str) -> Dict[str, Any]:
+    """
+    Load only the tensors of a model file (no YOLO graph construction).
+    .pt checkpoints are memory-mapped, so parameters page in on demand.
+    """
+    if path.endswith('.safetensors') and SAFETENSORS_AVAILABLE:
+        return load_safetensors(path, device=device)
+    
+    # Ultralytics checkpoints pickle the model module, so weights_only can't be used
+    checkpoint = torch.load(path, map_location=device, mmap=True, weights_only=False)
+    model = _checkpoint_model(checkpoint)
+    return model.state_dict() if model is not None else checkpoint
+
+
+def _replace_with_link(source: str, destination: str):
+    """Atomically point destination at source (hard link, copy if links are unsupported)"""
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+    temp_path = destination + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+def _checkpoint_model(checkpoint: Any):
+    """The module YOLO loads from an Ultralytics checkpoint (EMA weights when present)"""
+    if isinstance(checkpoint, dict) and ('ema' in checkpoint or 'model' in checkpoint):
+        return checkpoint.get('ema') or checkpoint['model']
+    return None
+
+
+def _history_entry(model_data: Dict) -> Dict:
+    """Summary of a global model version for /model_history"""
+    return {
+        'version': model_data['version'],
+        'timestamp': model_data['aggregation_timestamp'],
+        'devices': model_data['participating_devices'],
+        'accuracy': model_data['average_accuracy']
+    }
+
+
+class PendingLayers:
+    """
+    Pending weight updates in structure-of-arrays form: one preallocated (rows, N)
+    float32 matrix holding every key side by side (N = total parameters), plus the
+    sample counts, so aggregation reads the (K, N) stack directly instead of
+    gathering it from every update. Also keeps running sample/metric totals for
+    every pending update (YOLO ones included).
+    """
+    
+    def __init__(self, capacity: int = AGGREGATION_THRESHOLD):
+        self.count = 0
+        self.capacity = capacity
+        self.matrix: Optional[np.ndarray] = None
+        self.offsets: Dict[str, Tuple[int, int]] = {}  # key -> column range in the matrix
+        self.shapes: Dict[str, tuple] = {}
+        self.sample_counts = np.zeros(capacity, dtype=np.int64)
+        self.total_samples = 0
+        self.loss_sum = 0.0  # sample-weighted
+        self.accuracy_sum = 0.0  # sample-weighted
+    
+    def record(self, update: 'ModelUpdate'):
+        """Add an update to the running totals"""
+        self.total_samples += update.num_samples
+        self.loss_sum += update.num_samples * update.training_loss
+        self.accuracy_sum += update.num_samples * update.validation_accuracy
+    
+    def append(self, weights: Dict[str, Any], num_samples: int):
+        """Copy one update into the next row (raises ValueError on mismatched keys/shapes)"""
+        arrays = {key: np.asarray(value, dtype=np.float32) for key, value in weights.items()}
+        if self.matrix is None:
+            # The first update fixes the column layout
+            columns = 0
+            for key, array in arrays.items():
+                self.offsets[key] = (columns, columns + array.size)
+                self.shapes[key] = array.shape
+                columns += array.size
+            self.matrix = np.empty((self.capacity, columns), dtype=np.float32)
+        else:
+            if arrays.keys() != self.offsets.keys():
+                raise ValueError('weight_updates keys do not match the pending updates')
+            for key, array in arrays.items():
+                if array.shape != self.shapes[key]:
+                    raise ValueError(f'Shape mismatch for {key}: {array.shape} != {self.shapes[key]}')
+        
+        if self.count == self.capacity:
+            self._grow()
+        row = self.matrix[self.count]
+        for key, array in arrays.items():
+            start, stop = self.offsets[key]
+            row[start:stop] = array.ravel()
+        self.sample_counts[self.count] = num_samples
+        self.count += 1
+    
+    def same_layout(self, other: 'PendingLayers') -> bool:
+        """Whether another buffer set's rows fit this one (true while either has no layout yet)"""
+        return self.matrix is None or other.matrix is None or self.shapes == other.shapes
+    
+    def extend(self, other: 'PendingLayers'):
+        """Append every row (and the totals) of another buffer set (check same_layout first)"""
+        for row in range(other.count):
+            weights = {key: other.stacked(key)[row].reshape(other.shapes[key]) for key in other.offsets}
+            self.append(weights, int(other.sample_counts[row]))
+        self.total_samples += other.total_samples
+        self.loss_sum += other.loss_sum
+        self.accuracy_sum += other.accuracy_sum
+    
+    def stacked(self, key: Optional[str] = None) -> np.ndarray:
+        """(count, N) view of a key's columns (all columns without a key)"""
+        if key is None:
+            return self.matrix[:self.count]
+        start, stop = self.offsets[key]
+        return self.matrix[:self.count, start:stop]
+    
+    def _grow(self):
+        self.capacity *= 2
+        grown = np.empty((self.capacity, self.matrix.shape[1]), dtype=np.float32)
+        grown[:self.count] = self.matrix[:self.count]
+        self.matrix = grown
+        self.sample_counts = np.resize(self.sample_counts, self.capacity)
+
+
+def read_upload_json() -> Optional[Dict]:
+    """
+    Parse the upload body. With ijson the request stream is decoded incrementally,
+    so the raw body is never buffered alongside the parsed tree. Returns None if
+    the body isn't valid JSON.
+    """
+    if IJSON_AVAILABLE:
+        try:
+            # Buffered wrapper: ijson probes with read(0), which werkzeug's stream treats as a disconnect
+            return dict(ijson.kvitems(io.BufferedReader(request.stream, 1 << 16), '', use_float=True))
+        except JSONError:
+            return None
+    return request.get_json(silent=True, cache=False)
+
+
 class FederatedAggregator:
     """Manages federated learning aggregation"""
     
     def __init__(self):
         self.pending_updates: List[ModelUpdate] = []
+        # Weights of the pending (non-YOLO) updates, stacked per key as they arrive
+        self.pending_layers = PendingLayers()
         self.current_version = 0
         self.global_model = None
-        self.lock = threading.Lock()
+        self.lock = AggregatorLock()
+        # Serializes aggregations; self.lock only guards pending_updates/global_model swaps
+        self._aggregation_lock = threading.Lock()
+        # Failed rounds in a row, and when uploads may trigger the next attempt
+        self._failed_attempts = 0
+        self._retry_after = 0.0
+        
+        # Checkpoint/metadata writes run on one I/O thread so aggregation doesn't wait on disk
+        self._io_executor = ThreadPoolExecutor(max_workers=1)
+        self._pending_write: Optional[Future] = None
+        atexit.register(self.finalize)
+        
+        # Version summaries, oldest first (appended on every save)
+        self.history: List[Dict] = self._load_history()
         self.load_global_model()
         
         # Start background aggregation thread
@@ -77,86 +314,165 @@ class FederatedAggregator:
     
     def add_update(self, update: ModelUpdate):
         """Add a client update to pending queue"""
+        snapshot = None
         with self.lock:
+            if 'model_path' not in update.weight_updates:
+                self.pending_layers.append(update.weight_updates, update.num_samples)
+                # The weights now live in pending_layers; don't keep a second copy
+                update.weight_updates = {}
+            self.pending_layers.record(update)
             self.pending_updates.append(update)
             print(f"📊 Received update from {update.device_id}")
             print(f"   Pending updates: {len(self.pending_updates)}/{AGGREGATION_THRESHOLD}")
             
-            # Trigger aggregation if threshold reached
-            if len(self.pending_updates) >= AGGREGATION_THRESHOLD:
-                self._aggregate_updates()
+            # Trigger aggregation if threshold reached (not while backing off after a failure)
+            if len(self.pending_updates) >= AGGREGATION_THRESHOLD and time.monotonic() >= self._retry_after:
+                snapshot = self._take_pending()
+        
+        # Aggregate outside the lock so other uploads aren't blocked
+        if snapshot is not None:
+            self._aggregate_updates(*snapshot)
     
-    def _aggregate_updates(self):
-        """Perform Federated Averaging on pending updates (supports YOLO models)"""
-        if len(self.pending_updates) == 0:
-            return
+    def aggregate_pending(self) -> bool:
+        """Aggregate whatever updates are pending now"""
+        with self.lock:
+            snapshot = self._take_pending()
+        return self._aggregate_updates(*snapshot)
+    
+    def _take_pending(self) -> Tuple[List[ModelUpdate], PendingLayers]:
+        """Swap out the pending updates and their layers (call with self.lock held)"""
+        snapshot = self.pending_updates, self.pending_layers
+        self.pending_updates = []
+        self.pending_layers = PendingLayers()
+        return snapshot
+    
+    def _aggregate_updates(self, updates: List[ModelUpdate], layers: PendingLayers) -> bool:
+        """
+        Perform Federated Averaging on a snapshot of updates (supports YOLO models)
         
-        print(f"\n🔄 Starting aggregation with {len(self.pending_updates)} updates...")
+        Runs without self.lock; it is only taken to publish the new global model.
+        """
+        if len(updates) == 0:
+            return False
+        
+        with self._aggregation_lock:
+            return self._aggregate_snapshot(updates, layers)
+    
+    def _aggregate_snapshot(self, updates: List[ModelUpdate], layers: PendingLayers) -> bool:
+        """FedAvg body (call with self._aggregation_lock held)"""
+        print(f"\n🔄 Starting aggregation with {len(updates)} updates...")
         
         # Check if we have YOLO model updates (model_path in weights)
-        has_yolo_updates = any('model_path' in u.weight_updates for u in self.pending_updates)
+        has_yolo_updates = any('model_path' in u.weight_updates for u in updates)
+        global_model = checkpoint = None
         
         if has_yolo_updates and YOLO_AVAILABLE:
             # Aggregate YOLO models
-            self._aggregate_yolo_models()
+            result = self._aggregate_yolo_models(updates, layers)
+            if result is not None:
+                global_model, checkpoint = result
         else:
             # Traditional weight aggregation
             aggregated_weights = {}
-            total_samples = sum(update.num_samples for update in self.pending_updates)
+            sample_counts = layers.sample_counts[:layers.count]
+            total_samples = layers.total_samples
             
-            if total_samples == 0:
-                return
+            if total_samples == 0 or layers.count != len(updates):
+                self._aggregation_failed(updates, layers)
+                return False
             
-            # Get all weight keys from first update
-            weight_keys = self.pending_updates[0].weight_updates.keys()
+            # Weighted average based on number of training samples
+            sample_weights = (sample_counts / total_samples).astype(np.float32)
             
-            for key in weight_keys:
-                # Weighted average based on number of training samples
-                first_weights = np.array(self.pending_updates[0].weight_updates[key])
-                weighted_sum = np.zeros_like(first_weights, dtype=np.float64)
-                
-                for update in self.pending_updates:
-                    weight = update.num_samples / total_samples
-                    update_weights = np.array(update.weight_updates[key], dtype=np.float64)
-                    weighted_sum += update_weights * weight
-                
-                aggregated_weights[key] = weighted_sum.tolist()
+            # The (K, N) float32 stack is already laid out by PendingLayers: the weighted sum
+            # is a BLAS matrix-vector product (vectorized, multi-threaded sgemv)
+            if layers.stacked().size < KEY_PARALLEL_MIN_PARAMS:
+                # One product for the whole model, split per key afterwards (no per-key dispatch)
+                averaged = sample_weights @ layers.stacked()
+                reduced = (averaged[start:stop] for start, stop in layers.offsets.values())
+            else:
+                reduce_key = lambda key: sample_weights @ layers.stacked(key)
+                reduced = _key_executor.map(reduce_key, layers.offsets)
+            for key, value in zip(layers.offsets, reduced):
+                aggregated_weights[key] = value.reshape(layers.shapes[key]).tolist()
             
-            # Calculate average metrics
-            avg_loss = np.mean([u.training_loss for u in self.pending_updates])
-            avg_accuracy = np.mean([u.validation_accuracy for u in self.pending_updates])
+            # Average metrics (weighted by samples, like the weights) from the running totals
+            avg_loss = layers.loss_sum / total_samples
+            avg_accuracy = layers.accuracy_sum / total_samples
             
             # Create new global model
-            self.current_version += 1
-            self.global_model = GlobalModel(
-                version=self.current_version,
+            global_model = GlobalModel(
+                version=self.current_version + 1,
                 weights=aggregated_weights,
-                participating_devices=len(self.pending_updates),
+                participating_devices=len(updates),
                 aggregation_timestamp=datetime.utcnow().isoformat(),
                 average_loss=float(avg_loss),
                 average_accuracy=float(avg_accuracy)
             )
         
-        # Save global model
-        self.save_global_model()
+        if global_model is None:
+            self._aggregation_failed(updates, layers)
+            return False
         
-        # Update backend model
-        self._update_backend_model()
+        self._failed_attempts = 0
+        self._retry_after = 0.0
+        
+        # Publish the new global model
+        with self.lock:
+            self.global_model = global_model
+            self.current_version = global_model.version
         
-        # Clear pending updates
-        self.pending_updates.clear()
+        # Save global model and update backend model in the background
+        self._submit_write(self._persist_global_model, global_model, checkpoint)
         
         print(f"✅ Aggregation complete!")
-        print(f"   Version: {self.current_version}")
-        print(f"   Devices: {self.global_model.participating_devices}")
-        if self.global_model:
-            print(f"   Avg Loss: {self.global_model.average_loss:.4f}")
-            print(f"   Avg Accuracy: {self.global_model.average_accuracy:.4f}\n")
-    
-    def _aggregate_yolo_models(self):
-        """Aggregate YOLO model weights using FedAvg"""
+        print(f"   Version: {global_model.version}")
+        print(f"   Devices: {global_model.participating_devices}")
+        print(f"   Avg Loss: {global_model.average_loss:.4f}")
+        print(f"   Avg Accuracy: {global_model.average_accuracy:.4f}\n")
+        return True
+    
+    def _aggregation_failed(self, updates: List[ModelUpdate], layers: PendingLayers):
+        """Keep a failed snapshot for a later attempt with backoff, or drop it after too many failures"""
+        self._failed_attempts += 1
+        if self._failed_attempts >= MAX_AGGREGATION_ATTEMPTS:
+            print(f"❌ Aggregation failed {self._failed_attempts} times, dropping {len(updates)} updates")
+            self._failed_attempts = 0
+            self._retry_after = 0.0
+            return
+        
+        if not self._restore_pending(updates, layers):
+            self._failed_attempts = 0
+            self._retry_after = 0.0
+            return
+        
+        delay = AGGREGATION_RETRY_DELAY * 2 ** (self._failed_attempts - 1)
+        print(f"⚠️  Aggregation failed (attempt {self._failed_attempts}/{MAX_AGGREGATION_ATTEMPTS}), "
+              f"keeping {len(updates)} updates, retry in {delay}s")
+        self._retry_after = time.monotonic() + delay
+    
+    def _restore_pending(self, updates: List[ModelUpdate], layers: PendingLayers) -> bool:
+        """Put a snapshot back in front of updates that arrived meanwhile"""
+        with self.lock:
+            if not layers.same_layout(self.pending_layers):
+                # The updates received since fixed a different layout (the model changed):
+                # keep those and drop the failed snapshot, nothing has been modified yet
+                print(f"⚠️  Dropping {len(updates)} failed updates: layers don't match the updates received since")
+                return False
+            layers.extend(self.pending_layers)
+            self.pending_layers = layers
+            self.pending_updates[:0] = updates
+            return True
+    
+    def _aggregate_yolo_models(self, updates: List[ModelUpdate], layers: PendingLayers) -> Optional[Tuple]:
+        """
+        Aggregate YOLO model weights using FedAvg
+        
+        Returns the new global model and its staged checkpoint (base path, CPU state
+        dict, versioned path, latest path) for the I/O thread to write, or None.
+        """
         try:
-            total_samples = sum(update.num_samples for update in self.pending_updates)
+            total_samples = layers.total_samples
             if total_samples == 0:
                 return
             
@@ -166,88 +482,133 @@ class FederatedAggregator:
                 base_model_path = self.global_model.weights['model_path']
             elif os.path.exists(INITIAL_MODEL_PATH):
                 base_model_path = INITIAL_MODEL_PATH
-            elif 'model_path' in self.pending_updates[0].weight_updates:
-                base_model_path = self.pending_updates[0].weight_updates['model_path']
+            elif 'model_path' in updates[0].weight_updates:
+                base_model_path = updates[0].weight_updates['model_path']
+            
+            # The base may be the checkpoint the previous aggregation is still writing
+            self._wait_for_write()
             
             if not base_model_path or not os.path.exists(base_model_path):
                 print("⚠️  No base YOLO model found, falling back to weight aggregation")
                 return
             
-            # Load base model
-            base_model = YOLO(base_model_path)
-            base_state_dict = base_model.model.state_dict()
+            # Accumulate as float32 tensors on the GPU when there is one (no host round-trips)
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            
+            # Load base model weights (state_dict() is built once, no YOLO graph construction)
+            base_state_dict = _load_state_dict(base_model_path, device)
             
             # Initialize aggregated state dict
-            aggregated_state_dict = {}
-            for key in base_state_dict.keys():
-                aggregated_state_dict[key] = np.zeros_like(base_state_dict[key].cpu().numpy(), dtype=np.float64)
+            aggregated_state_dict = {
+                key: torch.zeros_like(value, dtype=torch.float32, device=device)
+                for key, value in base_state_dict.items()
+            }
+            accumulators = list(aggregated_state_dict.items())
             
             # Weighted aggregation
-            for update in self.pending_updates:
+            for update in updates:
                 weight = update.num_samples / total_samples
                 
                 # Load update model
                 update_model_path = update.weight_updates.get('model_path')
                 if update_model_path and os.path.exists(update_model_path):
-                    update_model = YOLO(update_model_path)
-                    update_state_dict = update_model.model.state_dict()
+                    update_state_dict = _load_state_dict(update_model_path, device)
                     
-                    for key in base_state_dict.keys():
+                    for key, accumulated in accumulators:
                         if key in update_state_dict:
-                            update_weights = update_state_dict[key].cpu().numpy()
-                            aggregated_state_dict[key] += update_weights * weight
+                            accumulated.add_(update_state_dict[key].to(device, torch.float32), alpha=weight)
             
-            # Save aggregated model
+            # Stage the aggregated weights in host memory; the I/O thread writes the checkpoint
+            staged_state_dict = {key: value.cpu() for key, value in aggregated_state_dict.items()}
             aggregated_model_path = os.path.join(MODEL_STORAGE_PATH, f'global_model_v{self.current_version + 1}.pt')
-            
-            # Copy base model structure and update weights
-            shutil.copy2(base_model_path, aggregated_model_path)
-            aggregated_model = YOLO(aggregated_model_path)
-            
-            # Update model weights
-            import torch
-            for key, value in aggregated_state_dict.items():
-                if key in aggregated_model.model.state_dict():
-                    aggregated_model.model.state_dict()[key].copy_(torch.from_numpy(value))
-            
-            # Save the updated model
-            aggregated_model.save(aggregated_model_path)
-            
-            # Also save as latest
             latest_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest.pt')
-            shutil.copy2(aggregated_model_path, latest_path)
             
-            # Calculate average metrics
-            avg_loss = np.mean([u.training_loss for u in self.pending_updates])
-            avg_accuracy = np.mean([u.validation_accuracy for u in self.pending_updates])
+            # Average metrics (weighted by samples, like the weights) from the running totals
+            avg_loss = layers.loss_sum / total_samples
+            avg_accuracy = layers.accuracy_sum / total_samples
             
             # Create new global model
-            self.current_version += 1
-            self.global_model = GlobalModel(
-                version=self.current_version,
+            global_model = GlobalModel(
+                version=self.current_version + 1,
                 weights={'model_path': latest_path},
-                participating_devices=len(self.pending_updates),
+                participating_devices=len(updates),
                 aggregation_timestamp=datetime.utcnow().isoformat(),
                 average_loss=float(avg_loss),
                 average_accuracy=float(avg_accuracy)
             )
             
             print(f"✅ YOLO model aggregation complete!")
+            return global_model, (base_model_path, staged_state_dict, aggregated_model_path, latest_path)
             
         except Exception as e:
             print(f"❌ Error aggregating YOLO models: {e}")
             # Fallback to basic aggregation
             pass
     
-    def _update_backend_model(self):
+    def _write_yolo_checkpoint(self, base_model_path: str, state_dict: Dict[str, Any],
+                               aggregated_model_path: str, latest_path: str):
+        """
+        Write aggregated weights into the base YOLO checkpoint: serialized once
+        in memory and written once to the versioned path
+        """
+        checkpoint = torch.load(base_model_path, map_location='cpu', mmap=True, weights_only=False)
+        model = _checkpoint_model(checkpoint)
+        if model is None:
+            # Plain state dict checkpoint
+            checkpoint = state_dict
+        else:
+            # Update model weights (casts back to each tensor's dtype)
+            model.load_state_dict(state_dict, strict=False)
+            checkpoint['date'] = datetime.utcnow().isoformat()
+        
+        buffer = io.BytesIO()
+        torch.save(checkpoint, buffer)
+        data = buffer.getvalue()
+        
+        # Written once; latest is a link to it. Replace rather than overwrite: the old
+        # files may be links to the initial model
+        with open(aggregated_model_path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(aggregated_model_path + '.tmp', aggregated_model_path)
+        _replace_with_link(aggregated_model_path, latest_path)
+    
+    def _persist_global_model(self, global_model: Optional[GlobalModel], checkpoint: Optional[Tuple]):
+        """Write everything an aggregation produced (runs on the I/O thread)"""
+        try:
+            if checkpoint is not None:
+                self._write_yolo_checkpoint(*checkpoint)
+            self.save_global_model(global_model)
+            self._update_backend_model(global_model)
+        except Exception as e:
+            print(f"❌ Error saving global model: {e}")
+    
+    def _submit_write(self, function, *args):
+        """Queue a disk write; only blocks if the previous write is still running"""
+        self._wait_for_write()
+        self._pending_write = self._io_executor.submit(function, *args)
+    
+    def _wait_for_write(self):
+        """Block until the last queued disk write has finished"""
+        if self._pending_write is not None:
+            self._pending_write.result()
+            self._pending_write = None
+    
+    def finalize(self):
+        """Drain pending disk writes (called at shutdown)"""
+        self._wait_for_write()
+        self._io_executor.shutdown(wait=True)
+    
+    def _update_backend_model(self, global_model: Optional[GlobalModel] = None):
         """Update backend model with latest aggregated model"""
-        if self.global_model and 'model_path' in self.global_model.weights:
+        global_model = global_model or self.global_model
+        if global_model and 'model_path' in global_model.weights:
             try:
-                latest_path = self.global_model.weights['model_path']
+                latest_path = global_model.weights['model_path']
                 if os.path.exists(latest_path):
-                    # Copy to backend models directory
+                    # Link into backend models directory: metadata-only, and atomic for
+                    # readers of best.pt (copies only across filesystems)
                     backend_path = os.path.join(BACKEND_MODELS_PATH, 'best.pt')
-                    shutil.copy2(latest_path, backend_path)
+                    _replace_with_link(latest_path, backend_path)
                     print(f"✅ Updated backend model: {backend_path}")
             except Exception as e:
                 print(f"⚠️  Error updating backend model: {e}")
@@ -256,10 +617,9 @@ class FederatedAggregator:
         """Background thread for periodic aggregation"""
         while True:
             time.sleep(AGGREGATION_INTERVAL)
-            with self.lock:
-                if len(self.pending_updates) > 0:
-                    print(f"⏰ Periodic aggregation triggered")
-                    self._aggregate_updates()
+            if len(self.pending_updates) > 0:
+                print(f"⏰ Periodic aggregation triggered")
+                self.aggregate_pending()
     
     def get_global_model(self) -> GlobalModel:
         """Get current global model"""
@@ -274,13 +634,14 @@ class FederatedAggregator:
         # Try to initialize from existing YOLO model
         if os.path.exists(INITIAL_MODEL_PATH) and YOLO_AVAILABLE:
             try:
-                # Copy initial model to federated models
+                # Link initial model into federated models (no copy until an aggregation
+                # produces new weights; later writes replace these paths instead of writing through)
                 initial_pt_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_v0.pt')
-                shutil.copy2(INITIAL_MODEL_PATH, initial_pt_path)
+                _replace_with_link(INITIAL_MODEL_PATH, initial_pt_path)
                 
-                # Also copy as latest
+                # Also link as latest
                 latest_pt_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest.pt')
-                shutil.copy2(INITIAL_MODEL_PATH, latest_pt_path)
+                _replace_with_link(INITIAL_MODEL_PATH, latest_pt_path)
                 
                 print(f"✅ Initialized federated model from {INITIAL_MODEL_PATH}")
                 
@@ -313,25 +674,58 @@ class FederatedAggregator:
             average_accuracy=0.0
         )
     
-    def save_global_model(self):
+    def save_global_model(self, global_model: Optional[GlobalModel] = None):
         """Save global model to disk (metadata and .pt file if YOLO)"""
-        if self.global_model is None:
+        global_model = global_model or self.global_model
+        if global_model is None:
             return
         
-        # Save JSON metadata
-        filepath = os.path.join(MODEL_STORAGE_PATH, f'global_model_v{self.current_version}.json')
+        # Serialize the JSON metadata once
+        model_data = asdict(global_model)
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(model_data, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(model_data, indent=2).encode()
         
-        with open(filepath, 'w') as f:
-            json.dump(asdict(self.global_model), f, indent=2)
+        filepath = os.path.join(MODEL_STORAGE_PATH, f'global_model_v{global_model.version}.json')
+        with open(filepath, 'wb') as f:
+            f.write(data)
         
-        # Also save as latest
+        # Also save as latest (atomic rename, so readers never see a torn file)
         latest_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest.json')
-        with open(latest_path, 'w') as f:
-            json.dump(asdict(self.global_model), f, indent=2)
+        with open(latest_path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(latest_path + '.tmp', latest_path)
+        
+        # Record the version in the history log
+        entry = _history_entry(model_data)
+        with open(HISTORY_PATH, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.history.append(entry)
         
         # YOLO model .pt file is already saved in _aggregate_yolo_models
         print(f"💾 Global model saved: {filepath}")
     
+    def _load_history(self) -> List[Dict]:
+        """Read history.jsonl, building it from the version files the first time"""
+        if os.path.exists(HISTORY_PATH):
+            with open(HISTORY_PATH, 'r') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        
+        history = []
+        for filename in os.listdir(MODEL_STORAGE_PATH):
+            if filename.startswith('global_model_v') and filename.endswith('.json'):
+                filepath = os.path.join(MODEL_STORAGE_PATH, filename)
+                with open(filepath, 'r') as f:
+                    history.append(_history_entry(json.load(f)))
+        
+        # Sort by version
+        history.sort(key=lambda x: x['version'])
+        
+        with open(HISTORY_PATH, 'w') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in history)
+        return history
+    
     def load_global_model(self):
         """Load global model from disk (supports YOLO .pt files)"""
         latest_path = os.path.join(MODEL_STORAGE_PATH, 'global_model_latest.json')
@@ -404,7 +798,9 @@ def upload_update():
     {
         "device_id": "uuid",
         "version": 1,
-        "weight_updates": {...},
+        "weight_updates": {...},  # per layer: list of floats, or
+                                  # {"dtype": "float32", "shape": [...], "data": "<base64>"}
+                                  # (int8 adds "scale" and optional "zero_point")
         "num_samples": 10,
         "training_loss": 0.15,
         "validation_accuracy": 0.82,
@@ -412,7 +808,9 @@ def upload_update():
     }
     """
     try:
-        data = request.get_json()
+        data = read_upload_json()
+        if data is None:
+            return jsonify({'error': 'Invalid JSON body'}), 400
         
         # Validate required fields
         required_fields = ['device_id', 'version', 'weight_updates', 'num_samples', 
@@ -421,19 +819,27 @@ def upload_update():
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Missing required fields'}), 400
         
+        try:
+            weight_updates = decode_weight_updates(data['weight_updates'])
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({'error': f'Invalid weight_updates: {e}'}), 400
+        
         # Create ModelUpdate object
         update = ModelUpdate(
             device_id=data['device_id'],
             version=data['version'],
-            weight_updates=data['weight_updates'],
+            weight_updates=weight_updates,
             num_samples=data['num_samples'],
             training_loss=data['training_loss'],
             validation_accuracy=data['validation_accuracy'],
             timestamp=data['timestamp']
         )
         
-        # Add to aggregator
-        aggregator.add_update(update)
+        # Add to aggregator (rejects layers that don't match the pending updates)
+        try:
+            aggregator.add_update(update)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
             'message': 'Update received successfully',
@@ -441,6 +847,9 @@ def upload_update():
             'current_version': aggregator.current_version
         }), 200
         
+    except HTTPException:
+        # e.g. 413 once the body exceeds MAX_CONTENT_LENGTH
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -472,11 +881,15 @@ def get_global_model():
 def trigger_aggregation():
     """Manually trigger aggregation (for testing)"""
     try:
-        with aggregator.lock:
-            if len(aggregator.pending_updates) == 0:
-                return jsonify({'message': 'No pending updates to aggregate'}), 200
-            
-            aggregator._aggregate_updates()
+        if len(aggregator.pending_updates) == 0:
+            return jsonify({'message': 'No pending updates to aggregate'}), 200
+        
+        if not aggregator.aggregate_pending():
+            return jsonify({
+                'error': 'Aggregation failed',
+                'pending_updates': len(aggregator.pending_updates),
+                'current_version': aggregator.current_version
+            }), 500
         
         return jsonify({
             'message': 'Aggregation completed',
@@ -491,22 +904,8 @@ def trigger_aggregation():
 def get_model_history():
     """Get history of all global model versions"""
     try:
-        history = []
-        
-        for filename in os.listdir(MODEL_STORAGE_PATH):
-            if filename.startswith('global_model_v') and filename.endswith('.json'):
-                filepath = os.path.join(MODEL_STORAGE_PATH, filename)
-                with open(filepath, 'r') as f:
-                    model_data = json.load(f)
-                    history.append({
-                        'version': model_data['version'],
-                        'timestamp': model_data['aggregation_timestamp'],
-                        'devices': model_data['participating_devices'],
-                        'accuracy': model_data['average_accuracy']
-                    })
-        
-        # Sort by version
-        history.sort(key=lambda x: x['version'], reverse=True)
+        # Newest first
+        history = aggregator.history[::-1]
         
         return jsonify({
             'history': history,
@@ -541,6 +940,8 @@ if __name__ == '__main__':
     print(f"   GET  /api/federated/global_model")
     print(f"   POST /api/federated/trigger_aggregation")
     print(f"   GET  /api/federated/model_history")
-    print(f"\n✅ Server ready! (Offline mode - no internet required)\n")
+    print(f"\n✅ Server ready! (Offline mode - no internet required)")
+    print(f"   Production: gunicorn -k gthread --workers 1 --threads 8 -b 0.0.0.0:{port} federated_server:app\n")
     
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # No debug reloader: it would start a second aggregator in the child process
+    app.run(host='0.0.0.0', port=port, threaded=True)
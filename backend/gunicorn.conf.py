@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for UroSmart Backend
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# Workers inherit this, so the detector sizes its interpreter pool per worker
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+# gevent workers: a request waiting on the database, Twilio or disk yields to others
+# instead of blocking the whole worker. The worker monkey-patches the stdlib before
+# loading the app, so don't use --preload with this worker class.
+worker_class = 'gevent'
+worker_connections = 1000
+timeout = 120
+
+
+def post_fork(server, worker):
+    """Make psycopg2 (a C extension gevent can't patch) cooperative"""
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
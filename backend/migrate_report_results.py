@@ -0,0 +1,60 @@
+"""
+One-off migration for existing databases:
+collapse the per-analyte medical_reports columns (<analyte>_present/_count/_confidence)
+into the single JSON `results` column
+
+Usage (from backend/): python migrate_report_results.py
+"""
+
+import os
+
+# Model preload is not needed for a schema migration
+os.environ.setdefault('SKIP_MODEL_PRELOAD', 'True')
+
+from sqlalchemy import inspect, text
+
+from app import app, db, MedicalReport, ANALYTES
+
+FIELDS = ('present', 'count', 'confidence')
+
+
+def migrate():
+    with app.app_context():
+        columns = {column['name'] for column in inspect(db.engine).get_columns('medical_reports')}
+
+        if 'yeast_present' not in columns:
+            print("✅ medical_reports already uses the results column")
+            return
+
+        old_columns = [f'{analyte}_{field}' for analyte in ANALYTES for field in FIELDS]
+        old_columns = [name for name in old_columns if name in columns]
+        json_type = 'JSONB' if db.engine.dialect.name == 'postgresql' else 'JSON'
+        table = MedicalReport.__table__
+
+        with db.engine.begin() as conn:
+            if 'results' not in columns:
+                conn.execute(text(f'ALTER TABLE medical_reports ADD COLUMN results {json_type}'))
+
+            rows = conn.execute(
+                text(f"SELECT id, {', '.join(old_columns)} FROM medical_reports")
+            ).mappings().all()
+
+            for row in rows:
+                results = {
+                    analyte: {
+                        'present': bool(row.get(f'{analyte}_present') or False),
+                        'count': row.get(f'{analyte}_count') or 0,
+                        'confidence': row.get(f'{analyte}_confidence') or 0.0
+                    }
+                    for analyte in ANALYTES
+                }
+                conn.execute(table.update().where(table.c.id == row['id']).values(results=results))
+
+            for name in old_columns:
+                conn.execute(text(f'ALTER TABLE medical_reports DROP COLUMN {name}'))
+
+        print(f"✅ Migrated {len(rows)} reports, dropped {len(old_columns)} columns")
+
+
+if __name__ == '__main__':
+    migrate()
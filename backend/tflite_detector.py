@@ -7,7 +7,24 @@ import os
 import numpy as np
 from PIL import Image
 import io
-from typing import List, Dict, Tuple
+import _queue
+import _thread
+import contextlib
+import functools
+import time
+from typing import Any, Callable, List, Dict, Optional, Tuple, Union, BinaryIO
+
+# Inference runs on native threads (gevent's threadpool under the gevent worker), so
+# the interpreter pool, locks and batcher use real OS-thread primitives even when
+# gevent has monkey-patched threading/queue (its primitives can't block those threads)
+try:
+    from gevent.monkey import get_original
+    _native_lock = get_original('_thread', 'allocate_lock')
+    _start_native_thread = get_original('_thread', 'start_new_thread')
+except ImportError:
+    _native_lock = _thread.allocate_lock
+    _start_native_thread = _thread.start_new_thread
+NativeQueue = _queue.SimpleQueue  # C implementation, not replaced by monkey-patching
 
 try:
     import tensorflow as tf
@@ -22,6 +39,118 @@ except ImportError:
         TF_AVAILABLE = False
         Interpreter = None
 
+# libjpeg-turbo decoder for JPEG uploads (PIL is used for other formats or if unavailable)
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbojpeg = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _turbojpeg = None
+
+# OpenCV's SIMD INTER_AREA resize for preprocessing (PIL LANCZOS if unavailable)
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    CV2_AVAILABLE = False
+
+INPUT_SIZE = 640
+LETTERBOX_PAD = 114  # gray fill around letterboxed images (as in YOLO training)
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+
+# Model file in models/ (e.g. best_int8.tflite for a full-integer quantized export,
+# best.tflite stays available as the FP32 reference). TFLite applies its built-in
+# XNNPACK delegate by default; it accelerates FP32 and dynamic-range quantized
+# models, other ops fall back to the reference kernels.
+DETECTOR_MODEL = os.environ.get('DETECTOR_MODEL', 'best.tflite')
+
+# Parallel interpreters for concurrent requests (interpreters are not thread-safe);
+# each server worker process gets its share of the CPU cores (WEB_CONCURRENCY
+# workers, set by gunicorn.conf.py), split between its interpreters unless
+# DETECTOR_NUM_THREADS is set
+WORKER_CPUS = max(1, (os.cpu_count() or 2) // max(1, int(os.environ.get('WEB_CONCURRENCY', 1))))
+DETECTOR_POOL_SIZE = max(1, int(os.environ.get('DETECTOR_POOL_SIZE', WORKER_CPUS // 2)))
+DETECTOR_NUM_THREADS = max(1, int(os.environ.get('DETECTOR_NUM_THREADS', WORKER_CPUS // DETECTOR_POOL_SIZE)))
+
+# NMS compares all boxes of a class pairwise in one pass up to this many; above
+# it, one IoU round per kept box is cheaper (clustered boxes are dropped in bulk)
+NMS_MATRIX_MAX_BOXES = 128
+
+# Micro-batching of concurrent requests (only used if the model accepts batch > 1)
+MAX_BATCH = int(os.environ.get('DETECT_MAX_BATCH', 8))
+MAX_BATCH_DELAY = float(os.environ.get('DETECT_MAX_BATCH_DELAY_MS', 10)) / 1000
+
+
+class PendingResult:
+    """One-shot result slot a native thread can wait on (a Future would use patched locks)"""
+    
+    def __init__(self):
+        self._done = _native_lock()
+        self._done.acquire()
+        self._value = None
+        self._error = None
+    
+    def set_result(self, value):
+        self._value = value
+        self._done.release()
+    
+    def set_exception(self, error: BaseException):
+        self._error = error
+        self._done.release()
+    
+    def result(self):
+        """Block until the result is set, re-raising a stored exception"""
+        with self._done:
+            pass
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class MicroBatcher:
+    """Coalesces concurrent inference requests into batched interpreter calls"""
+    
+    def __init__(self, detector, max_batch: int = MAX_BATCH, max_delay: float = MAX_BATCH_DELAY):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = NativeQueue()
+        
+        # Native daemon thread, also under gevent (a greenlet would block the event loop)
+        _start_native_thread(self._run, ())
+    
+    def submit(self, input_data: np.ndarray) -> np.ndarray:
+        """Queue one preprocessed input [1, H, W, C] and wait for its output"""
+        future = PendingResult()
+        self.queue.put((input_data, future))
+        return future.result()
+    
+    def _run(self):
+        """Worker loop: drain up to max_batch items or wait at most max_delay"""
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except _queue.Empty:
+                    # Nothing else arrived within the window, dispatch what we have
+                    break
+            
+            try:
+                outputs = self.detector.run_batch([item[0] for item in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
 
 class TFLiteYOLODetector:
     """TFLite YOLO detector for microscopy images"""
@@ -38,15 +167,25 @@ class TFLiteYOLODetector:
     def __init__(self, model_path: str = None):
         """Initialize TFLite detector"""
         if model_path is None:
-            # Default to models/best.tflite relative to this file
+            # Default to models/<DETECTOR_MODEL> relative to this file
             base_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(base_dir, 'models', 'best.tflite')
+            model_path = os.path.join(base_dir, 'models', DETECTOR_MODEL)
             
         self.model_path = model_path
         self.interpreter = None
         self.input_details = None
         self.output_details = None
         self.input_shape = None
+        self.model_version = None
+        self.supports_batching = False
+        self._batch_size = 1
+        self._batcher = None
+        self._lock = _native_lock()  # Interpreter and its tensor buffers are not thread-safe
+        self._pool = NativeQueue()  # Idle interpreters for unbatched inference
+        self._interpreters = []  # Every pooled interpreter (for warmup)
+        self._input_dtype = np.float32
+        self._input_quantization = None
+        self._output_quantization = None
         
         if os.path.exists(model_path):
             self.load_model()
@@ -58,96 +197,344 @@ class TFLiteYOLODetector:
             return False
         
         try:
-            self.interpreter = Interpreter(model_path=self.model_path)
-            self.interpreter.allocate_tensors()
+            self.interpreter = self._create_interpreter()
             
             self.input_details = self.interpreter.get_input_details()
             self.output_details = self.interpreter.get_output_details()
             self.input_shape = self.input_details[0]['shape']
             
+            # Full-integer quantized models take and return int8/uint8 tensors
+            self._input_dtype = self.input_details[0]['dtype']
+            self._input_quantization = self._quantization(self.input_details[0])
+            self._output_quantization = self._quantization(self.output_details[0])
+            
+            # Identifies the loaded weights (changes when the model file is replaced)
+            stat = os.stat(self.model_path)
+            self.model_version = f"{os.path.basename(self.model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+            
             print(f"✅ TFLite model loaded: {self.model_path}")
             print(f"   Input shape: {self.input_shape}")
             print(f"   Output shape: {self.output_details[0]['shape']}")
+            print(f"   Threads: {DETECTOR_NUM_THREADS} (XNNPACK via the TFLite default delegate)")
+            
+            self.supports_batching = self._probe_batching()
+            if self.supports_batching and MAX_BATCH > 1:
+                self._batcher = MicroBatcher(self)
+                print(f"   Micro-batching: up to {MAX_BATCH} images / {MAX_BATCH_DELAY * 1000:.0f}ms")
+            else:
+                # Each interpreter owns its tensor buffers, so requests run in parallel
+                self._interpreters = [self.interpreter] + [
+                    self._create_interpreter() for _ in range(DETECTOR_POOL_SIZE - 1)
+                ]
+                for interpreter in self._interpreters:
+                    self._pool.put(interpreter)
+                print(f"   Interpreter pool: {DETECTOR_POOL_SIZE}")
             return True
             
         except Exception as e:
             print(f"❌ Error loading TFLite model: {e}")
             return False
     
-    def preprocess_image(self, image: Image.Image) -> np.ndarray:
-        """Preprocess image for YOLO inference"""
-        # Resize to 640x640
-        img_resized = image.resize((640, 640), Image.LANCZOS)
+    @staticmethod
+    def _quantization(details: Dict) -> Optional[Tuple[float, int]]:
+        """(scale, zero_point) of an integer tensor, None for float tensors"""
+        scale, zero_point = details['quantization']
+        if not np.issubdtype(details['dtype'], np.integer) or scale == 0:
+            return None
+        return float(scale), int(zero_point)
+    
+    def _create_interpreter(self):
+        """Create and allocate one interpreter (TFLite applies XNNPACK by default)"""
+        interpreter = Interpreter(model_path=self.model_path, num_threads=DETECTOR_NUM_THREADS)
+        interpreter.allocate_tensors()
+        return interpreter
+    
+    @contextlib.contextmanager
+    def _pooled_interpreter(self):
+        """Borrow an idle interpreter from the pool, blocking until one is free"""
+        interpreter = self._pool.get()
+        try:
+            yield interpreter
+        finally:
+            self._pool.put(interpreter)
+    
+    def _probe_batching(self) -> bool:
+        """Check whether the model graph accepts a batch dimension > 1"""
+        # Probe on a throwaway interpreter: a failed allocate_tensors() leaves
+        # the interpreter unusable
+        try:
+            probe = Interpreter(model_path=self.model_path)
+            shape = [2] + list(self.input_shape[1:])
+            probe.resize_tensor_input(self.input_details[0]['index'], shape)
+            probe.allocate_tensors()
+            return True
+        except Exception:
+            # Exported graph has a fixed batch (e.g. hard-coded reshape)
+            return False
+    
+    def _resize_batch(self, batch_size: int):
+        """Resize the input tensor batch dimension (no-op if unchanged)"""
+        if batch_size == self._batch_size:
+            return
+        self._batch_size = batch_size
+        shape = [batch_size] + list(self.input_shape[1:])
+        self.interpreter.resize_tensor_input(self.input_details[0]['index'], shape)
+        self.interpreter.allocate_tensors()
+    
+    def run_inference(self, image: Union[Image.Image, np.ndarray],
+                      postprocess: Optional[Callable[[np.ndarray], Any]] = None) -> Any:
+        """
+        Run the interpreter on an RGB image, returning the raw output [1, 9, 8400]
+        
+        With `postprocess` its result is returned instead. On the pooled path it
+        reads a zero-copy view of the output tensor while the interpreter is
+        still held; the view is invalidated by the next invoke(), so
+        `postprocess` must not keep references into it.
+        """
+        if self._batcher is not None:
+            # Batched with concurrent requests
+            output = self._batcher.submit(self.preprocess_image(image))
+            return output if postprocess is None else postprocess(output)
+        
+        with self._pooled_interpreter() as interpreter:
+            # Preprocess straight into the interpreter's input buffer (no intermediate copy);
+            # the view must be released before invoke()
+            input_view = interpreter.tensor(self.input_details[0]['index'])()
+            self.preprocess_image(image, out=input_view[0])
+            del input_view
+            
+            interpreter.invoke()
+            if postprocess is None:
+                return interpreter.get_tensor(self.output_details[0]['index'])
+            
+            output_view = interpreter.tensor(self.output_details[0]['index'])()
+            try:
+                return postprocess(output_view)
+            finally:
+                del output_view
+    
+    def run_batch(self, inputs: List[np.ndarray]) -> List[np.ndarray]:
+        """Run one interpreter call for a list of [1, H, W, C] inputs"""
+        input_index = self.input_details[0]['index']
+        output_index = self.output_details[0]['index']
+        
+        with self._lock:
+            if len(inputs) == 1 or not self.supports_batching:
+                outputs = []
+                self._resize_batch(1)
+                for input_data in inputs:
+                    input_view = self.interpreter.tensor(input_index)()
+                    np.copyto(input_view, input_data)
+                    del input_view
+                    self.interpreter.invoke()
+                    outputs.append(self.interpreter.get_tensor(output_index))
+                return outputs
+            
+            # Copy each input straight into its slot of the batched input tensor
+            # (no np.concatenate temporary and no set_tensor copy)
+            self._resize_batch(len(inputs))
+            input_view = self.interpreter.tensor(input_index)()
+            for i, input_data in enumerate(inputs):
+                input_view[i] = input_data[0]
+            del input_view
+            
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(output_index)
+            return [output[i:i + 1] for i in range(len(inputs))]
+    
+    def warmup(self) -> bool:
+        """Run one inference on a zero-filled input so the first request is not cold"""
+        if self.interpreter is None:
+            return False
+        
+        try:
+            dummy = np.zeros(self.input_shape, dtype=self.input_details[0]['dtype'])
+            # Every pooled interpreter (only the main one when micro-batching)
+            for interpreter in self._interpreters or [self.interpreter]:
+                interpreter.set_tensor(self.input_details[0]['index'], dummy)
+                interpreter.invoke()
+            print("🔥 TFLite detector warmed up")
+            return True
+        except Exception as e:
+            print(f"⚠️  Detector warmup failed: {e}")
+            return False
+    
+    def decode_image(self, image_data: Union[bytes, BinaryIO]) -> Union[Image.Image, np.ndarray]:
+        """
+        Decode an uploaded image to RGB
         
-        # Convert to numpy array and normalize to [0, 1]
-        img_array = np.array(img_resized, dtype=np.float32) / 255.0
+        JPEGs go through libjpeg-turbo when available, scaled down during the
+        IDCT as far as possible while both sides stay >= 640 px, so
+        high-resolution microscopy images are never decoded at full size.
+        With OpenCV installed the result is a uint8 HWC RGB array (other
+        formats decoded by cv2.imdecode), skipping the PIL image and its copy.
+        """
+        if _turbojpeg is not None or CV2_AVAILABLE:
+            if not isinstance(image_data, (bytes, bytearray)):
+                image_data = image_data.read()
+        
+        if _turbojpeg is not None and image_data[:3] == JPEG_SIGNATURE:
+            width, height, _, _ = _turbojpeg.decode_header(image_data)
+            scale = min(
+                (factor for factor in _turbojpeg.scaling_factors
+                 if width * factor[0] >= INPUT_SIZE * factor[1]
+                 and height * factor[0] >= INPUT_SIZE * factor[1]),
+                key=lambda factor: factor[0] / factor[1],
+                default=None
+            )
+            pixels = _turbojpeg.decode(image_data, pixel_format=TJPF_RGB, scaling_factor=scale)
+            return pixels if CV2_AVAILABLE else Image.fromarray(pixels)
+        
+        if CV2_AVAILABLE:
+            # EXIF orientation is ignored to match PIL
+            pixels = cv2.imdecode(
+                np.frombuffer(image_data, np.uint8),
+                cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+            )
+            if pixels is not None:
+                return cv2.cvtColor(pixels, cv2.COLOR_BGR2RGB, dst=pixels)
+            # Not decodable by OpenCV, let PIL try
         
-        # Add batch dimension: [1, 640, 640, 3]
-        img_array = np.expand_dims(img_array, axis=0)
+        if isinstance(image_data, (bytes, bytearray)):
+            image_data = io.BytesIO(image_data)
+        image = Image.open(image_data)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+    
+    @staticmethod
+    def _image_size(image: Union[Image.Image, np.ndarray]) -> Tuple[int, int]:
+        """(width, height) of a PIL image or HWC array"""
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        return image.size
+    
+    @classmethod
+    def letterbox_extent(cls, image: Union[Image.Image, np.ndarray]) -> Tuple[float, float]:
+        """Fraction (x, y) of the 640x640 input covered by the letterboxed image"""
+        width, height = cls._image_size(image)
         
-        return img_array
+        ratio = INPUT_SIZE / max(width, height)
+        new_width = max(1, min(INPUT_SIZE, round(width * ratio)))
+        new_height = max(1, min(INPUT_SIZE, round(height * ratio)))
+        return new_width / INPUT_SIZE, new_height / INPUT_SIZE
     
-    def postprocess_yolo(self, output: np.ndarray, conf_threshold: float = 0.55) -> Dict:
+    def preprocess_image(self, image: Union[Image.Image, np.ndarray], out: np.ndarray = None) -> np.ndarray:
+        """
+        Preprocess image for YOLO inference
+        
+        The image is letterboxed: scaled to fit 640x640 keeping its aspect
+        ratio, placed top-left and padded with gray (see letterbox_extent).
+        If `out` ([640, 640, 3] in the model's input dtype) is given the
+        pixels are written into it and it is returned; otherwise a new
+        [1, 640, 640, 3] array is allocated.
+        """
+        extent_x, extent_y = self.letterbox_extent(image)
+        new_size = (round(extent_x * INPUT_SIZE), round(extent_y * INPUT_SIZE))
+        
+        # Resize keeping the aspect ratio (SIMD INTER_AREA with OpenCV, else LANCZOS);
+        # skipped for clients that already send the target size (e.g. 640x640 from iOS)
+        if self._image_size(image) == new_size:
+            resized = np.asarray(image)
+        elif CV2_AVAILABLE:
+            resized = cv2.resize(np.asarray(image), new_size, interpolation=cv2.INTER_AREA)
+        else:
+            resized = np.asarray(image.resize(new_size, Image.LANCZOS))
+        
+        if new_size == (INPUT_SIZE, INPUT_SIZE):
+            pixels = resized
+        else:
+            pixels = np.full((INPUT_SIZE, INPUT_SIZE, 3), LETTERBOX_PAD, dtype=np.uint8)
+            pixels[:new_size[1], :new_size[0]] = resized
+        
+        batch = None
+        if out is None:
+            # Add batch dimension: [1, 640, 640, 3]
+            batch = np.empty((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=self._input_dtype)
+            out = batch[0]
+        
+        if self._input_quantization is not None:
+            # Integer model: quantize pixel / 255 with the input tensor's scale and zero point
+            scale, zero_point = self._input_quantization
+            limits = np.iinfo(out.dtype)
+            quantized = np.rint(pixels * np.float32(1 / (255.0 * scale)) + np.float32(zero_point))
+            np.clip(quantized, limits.min, limits.max, out=quantized)
+            np.copyto(out, quantized, casting='unsafe')
+        else:
+            # Normalize to [0, 1] in the same pass as the float conversion
+            np.divide(pixels, np.float32(255.0), out=out, dtype=np.float32)
+        
+        return out if batch is None else batch
+    
+    def postprocess_yolo(self, output: np.ndarray, conf_threshold: float = 0.55,
+                         extent: Tuple[float, float] = (1.0, 1.0)) -> Dict:
         """
         Postprocess YOLO output [1, 9, 8400]
         Same logic as iOS TFLiteWrapper
+        
+        `extent` is the letterbox_extent of the input image; boxes are mapped
+        back to [0, 1] coordinates of the original image.
         """
+        # Integer model output: dequantize once before decoding
+        if self._output_quantization is not None:
+            scale, zero_point = self._output_quantization
+            output = (output.astype(np.float32) - np.float32(zero_point)) * np.float32(scale)
+        
         # Remove batch dimension: [9, 8400]
         predictions = output[0]
         
-        num_classes = 5
-        num_predictions = 8400
+        num_classes = len(self.CLASS_NAMES)
         
-        detections_by_class = {class_id: [] for class_id in range(num_classes)}
+        # Best score for all 8400 predictions at once: an elementwise maximum over the
+        # few class rows (cheaper than a strided axis-0 reduction); the argmax is only
+        # needed for the survivors
+        class_scores = predictions[4:4 + num_classes]
+        max_conf = functools.reduce(np.maximum, class_scores)
+        keep = max_conf > conf_threshold
         
-        # Iterate through 8400 predictions
-        for i in range(num_predictions):
-            # Get class scores for this prediction
-            class_scores = predictions[4:9, i]  # 5 class scores
-            
-            # Find best class
-            max_conf = float(np.max(class_scores))
-            best_class = int(np.argmax(class_scores))
-            
-            if max_conf > conf_threshold:
-                # Extract bounding box (center coords + size)
-                cx = float(predictions[0, i])
-                cy = float(predictions[1, i])
-                w = float(predictions[2, i])
-                h = float(predictions[3, i])
-                
-                # Convert to x1, y1, x2, y2 (already normalized [0, 1])
-                x1 = cx - w/2
-                y1 = cy - h/2
-                x2 = cx + w/2
-                y2 = cy + h/2
-                
-                detections_by_class[best_class].append({
-                    'confidence': max_conf,
-                    'bbox': [x1, y1, x2, y2]
-                })
+        # Survivors transposed once into contiguous [N, 4] cx,cy,w,h rows (float64 like
+        # the old per-item floats), so each box is one row for tolist()
+        cxcywh = np.ascontiguousarray(predictions[0:4, keep].T, dtype=np.float64)
+        if extent != (1.0, 1.0):
+            # Undo the letterbox: the image only covers the top-left part of the input
+            cxcywh /= np.array(extent * 2)
+        centers = cxcywh[:, :2]
+        half_sizes = cxcywh[:, 2:] * 0.5
+        boxes = np.hstack((centers - half_sizes, centers + half_sizes))
+        areas = cxcywh[:, 2] * cxcywh[:, 3]
+        confidences = max_conf[keep].astype(np.float64)
+        kept_classes = class_scores[:, keep].argmax(axis=0)
+        
+        # NMS for all classes in one pass (boxes only suppress their own class);
+        # dicts are only built for kept boxes
+        nms_keep = self._nms_vec(boxes, confidences, iou_thr=0.45, classes=kept_classes, areas=areas)
         
-        # Apply NMS per class (simplified - just take top detections)
+        # Partition the kept boxes by class (stable, so each class stays in score order)
+        nms_keep = nms_keep[np.argsort(kept_classes[nms_keep], kind='stable')]
+        class_bounds = np.searchsorted(kept_classes[nms_keep], np.arange(num_classes + 1))
         final_detections = {}
         
         for class_id in range(num_classes):
-            class_dets = detections_by_class[class_id]
+            class_keep = nms_keep[class_bounds[class_id]:class_bounds[class_id + 1]]
             
-            if len(class_dets) > 0:
-                # Sort by confidence
-                class_dets.sort(key=lambda x: x['confidence'], reverse=True)
-                
-                # NMS: keep non-overlapping boxes
-                nms_dets = self._nms(class_dets, iou_threshold=0.45)
+            if class_keep.size > 0:
+                kept_scores = confidences[class_keep].tolist()
                 
                 # Calculate average confidence
-                avg_conf = sum(d['confidence'] for d in nms_dets) / len(nms_dets)
+                avg_conf = sum(kept_scores) / len(kept_scores)
+                
+                # Limit to 10
+                top = class_keep[:10]
+                nms_dets = [
+                    {'confidence': conf, 'bbox': bbox}
+                    for conf, bbox in zip(kept_scores[:10], boxes[top].tolist())
+                ]
                 
                 final_detections[self.CLASS_NAMES[class_id]] = {
                     'present': True,
-                    'count': len(nms_dets),
+                    'count': len(kept_scores),
                     'confidence': round(avg_conf, 3),
-                    'detections': nms_dets[:10]  # Limit to 10
+                    'detections': nms_dets
                 }
             else:
                 final_detections[self.CLASS_NAMES[class_id]] = {
@@ -159,60 +546,83 @@ class TFLiteYOLODetector:
         
         return final_detections
     
-    def _nms(self, detections: List[Dict], iou_threshold: float = 0.45) -> List[Dict]:
-        """Simple Non-Maximum Suppression"""
-        if len(detections) == 0:
-            return []
+    def _nms_vec(self, boxes: np.ndarray, scores: np.ndarray, iou_thr: float = 0.45,
+                 classes: np.ndarray = None, areas: np.ndarray = None) -> np.ndarray:
+        """
+        Vectorized Non-Maximum Suppression over [N, 4] x1,y1,x2,y2 boxes
+        Returns indices of the kept boxes, highest score first. With `classes`
+        a box only suppresses boxes of the same class (batched per-class NMS);
+        `areas` can pass in box areas already known from decoding (w * h).
+        """
+        if areas is None:
+            areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        
+        # Stable so equal scores keep their original order
+        order = np.argsort(-scores, kind='stable')
+        if order.size > NMS_MATRIX_MAX_BOXES:
+            if classes is None:
+                return self._nms_loop(boxes, areas, order, iou_thr)
+            # Group by class once (stable, so each group stays in score order)
+            by_class = order[np.argsort(classes[order], kind='stable')]
+            group_starts = np.flatnonzero(np.diff(classes[by_class])) + 1
+            kept = np.zeros(order.size, dtype=bool)
+            for class_order in np.split(by_class, group_starts):
+                kept[self._nms_loop(boxes, areas, class_order, iou_thr)] = True
+            return order[kept[order]]
+        
+        x1, y1, x2, y2 = boxes[order].T
+        areas = areas[order]
         
-        # Sort by confidence
-        detections = sorted(detections, key=lambda x: x['confidence'], reverse=True)
+        # All pairwise overlaps in one pass instead of one IoU round per kept box;
+        # iou >= thr tested as inter >= thr * union (a non-positive union is no overlap)
+        inter_w = np.maximum(0.0, np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1))
+        inter_h = np.maximum(0.0, np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1))
+        inter = inter_w * inter_h
+        union = areas[:, None] + areas - inter
+        overlaps = ~((inter < iou_thr * union) | (union <= 0))
+        if classes is not None:
+            sorted_classes = classes[order]
+            overlaps &= sorted_classes[:, None] == sorted_classes
         
+        # Greedy pass in score order: a kept box suppresses everything it overlaps
+        suppressed = np.zeros(order.size, dtype=bool)
+        keep = []
+        for i in range(order.size):
+            if not suppressed[i]:
+                keep.append(i)
+                suppressed |= overlaps[i]
+        
+        return order[keep]
+    
+    def _nms_loop(self, boxes: np.ndarray, areas: np.ndarray, order: np.ndarray, iou_thr: float) -> np.ndarray:
+        """NMS one kept box at a time, for box counts too large for the pairwise matrix"""
+        x1, y1, x2, y2 = boxes.T
         keep = []
         
-        while len(detections) > 0:
-            # Keep highest confidence detection
-            best = detections.pop(0)
-            keep.append(best)
+        while order.size > 0:
+            # Keep highest confidence box
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
             
-            # Remove overlapping detections
-            detections = [
-                d for d in detections
-                if self._iou(best['bbox'], d['bbox']) < iou_threshold
-            ]
+            # IoU of the kept box against all remaining ones
+            inter_w = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+            inter_h = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+            inter = inter_w * inter_h
+            union = areas[i] + areas[rest] - inter
+            
+            # Remove overlapping boxes; iou < thr tested as inter < thr * union
+            # to skip the divide (a non-positive union counts as no overlap)
+            order = rest[(inter < iou_thr * union) | (union <= 0)]
         
-        return keep
-    
-    def _iou(self, box1: List[float], box2: List[float]) -> float:
-        """Calculate Intersection over Union"""
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        # Intersection
-        inter_xmin = max(x1_min, x2_min)
-        inter_ymin = max(y1_min, y2_min)
-        inter_xmax = min(x1_max, x2_max)
-        inter_ymax = min(y1_max, y2_max)
-        
-        inter_width = max(0, inter_xmax - inter_xmin)
-        inter_height = max(0, inter_ymax - inter_ymin)
-        inter_area = inter_width * inter_height
-        
-        # Union
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area == 0:
-            return 0
-        
-        return inter_area / union_area
+        return np.array(keep, dtype=np.intp)
     
-    def detect(self, image_data: bytes, confidence_threshold: float = 0.55) -> Dict:
+    def detect(self, image_data: Union[bytes, BinaryIO], confidence_threshold: float = 0.55) -> Dict:
         """
         Detect objects in microscopy image
         
         Args:
-            image_data: Image bytes
+            image_data: Image bytes or a readable binary stream (decoded incrementally)
             confidence_threshold: Minimum confidence (default 0.40)
             
         Returns:
@@ -227,22 +637,17 @@ class TFLiteYOLODetector:
         
         try:
             # Load image
-            image = Image.open(io.BytesIO(image_data))
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Preprocess
-            input_data = self.preprocess_image(image)
-            
-            # Run inference
-            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-            self.interpreter.invoke()
-            
-            # Get output
-            output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
+            image = self.decode_image(image_data)
             
-            # Postprocess
-            detections = self.postprocess_yolo(output_data, confidence_threshold)
+            # Preprocess + run inference + postprocess (on the output tensor in place)
+            detections = self.run_inference(
+                image,
+                postprocess=functools.partial(
+                    self.postprocess_yolo,
+                    conf_threshold=confidence_threshold,
+                    extent=self.letterbox_extent(image)
+                )
+            )
             
             return {
                 'success': True,
@@ -260,18 +665,22 @@ class TFLiteYOLODetector:
 
 # Singleton instance
 _detector = None
+_detector_lock = _native_lock()
 
 def get_detector(model_path: str = None) -> TFLiteYOLODetector:
-    """Get or create TFLite detector instance"""
+    """Get or create TFLite detector instance (safe to call from concurrent requests)"""
     global _detector
     
     if _detector is None:
-        _detector = TFLiteYOLODetector(model_path)
+        with _detector_lock:
+            # Another request may have created it while we waited
+            if _detector is None:
+                _detector = TFLiteYOLODetector(model_path)
     
     return _detector
 
 
-def detect_objects(image_data: bytes, confidence_threshold: float = 0.55) -> Dict:
+def detect_objects(image_data: Union[bytes, BinaryIO], confidence_threshold: float = 0.55) -> Dict:
     """Convenience function for detection"""
     detector = get_detector()
     return detector.detect(image_data, confidence_threshold)
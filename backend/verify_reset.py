@@ -1,9 +1,33 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import sys
 import time
 
+# orjson encodes/decodes request and response bodies faster (stdlib json otherwise)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 BASE_URL = "http://localhost:5000/api"
+TIMEOUT = 5  # seconds, fail fast if the server hangs
+
+# One keep-alive connection for every call instead of a new one per request
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+def post_json(url, payload, **kwargs):
+    """POST a JSON body, encoded with orjson when available"""
+    if ORJSON_AVAILABLE:
+        headers = {**kwargs.pop('headers', {}), 'Content-Type': 'application/json'}
+        return session.post(url, data=orjson.dumps(payload), headers=headers, timeout=TIMEOUT, **kwargs)
+    return session.post(url, json=payload, timeout=TIMEOUT, **kwargs)
+
+def parse_json(response):
+    """Decode a JSON response body, with orjson when available"""
+    return orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
 
 def test_reset_flow():
     print("🚀 Starting OTP Password Reset Flow Test")
@@ -15,7 +39,7 @@ def test_reset_flow():
     
     print(f"\n1. Creating user {phone}...")
     try:
-        resp = requests.post(f"{BASE_URL}/auth/signup", json={
+        resp = post_json(f"{BASE_URL}/auth/signup", {
             "email": email,
             "password": password,
             "phone_number": phone
@@ -33,12 +57,12 @@ def test_reset_flow():
 
     # 2. Request OTP
     print(f"\n2. Requesting OTP for {phone}...")
-    resp = requests.post(f"{BASE_URL}/auth/forgot-password", json={"phone_number": phone})
+    resp = post_json(f"{BASE_URL}/auth/forgot-password", {"phone_number": phone})
     if resp.status_code != 200:
         print(f"❌ Failed to request OTP: {resp.text}")
         return
     
-    data = resp.json()
+    data = parse_json(resp)
     otp = data.get('dev_otp')
     if not otp:
         print("❌ No dev_otp returned (check backend logs or enable debug mode)")
@@ -51,7 +75,7 @@ def test_reset_flow():
     # 3. Reset Password
     new_password = "newpassword456"
     print(f"\n3. Resetting password with OTP...")
-    resp = requests.post(f"{BASE_URL}/auth/reset-password", json={
+    resp = post_json(f"{BASE_URL}/auth/reset-password", {
         "phone_number": phone,
         "otp": otp,
         "new_password": new_password
@@ -65,7 +89,7 @@ def test_reset_flow():
 
     # 4. Verify Login with New Password
     print("\n4. Verifying login with new password...")
-    resp = requests.post(f"{BASE_URL}/auth/login", json={
+    resp = post_json(f"{BASE_URL}/auth/login", {
         "email": email,
         "password": new_password
     })
@@ -1,8 +1,32 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import sys
 
+# orjson encodes/decodes request and response bodies faster (stdlib json otherwise)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 BASE_URL = "http://localhost:5000/api"
+TIMEOUT = 5  # seconds, fail fast if the server hangs
+
+# One keep-alive connection for every call instead of a new one per request
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+def post_json(url, payload, **kwargs):
+    """POST a JSON body, encoded with orjson when available"""
+    if ORJSON_AVAILABLE:
+        headers = {**kwargs.pop('headers', {}), 'Content-Type': 'application/json'}
+        return session.post(url, data=orjson.dumps(payload), headers=headers, timeout=TIMEOUT, **kwargs)
+    return session.post(url, json=payload, timeout=TIMEOUT, **kwargs)
+
+def parse_json(response):
+    """Decode a JSON response body, with orjson when available"""
+    return orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
 
 def print_status(message, status):
     if status:
@@ -15,21 +39,21 @@ def verify_server():
     
     # 1. Health Check
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = session.get(f"{BASE_URL}/health", timeout=TIMEOUT)
         if response.status_code == 200:
             print_status("Health Check Passed", True)
         else:
             print_status(f"Health Check Failed: {response.status_code}", False)
             return
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         print_status("Server is not running. Please start the server first.", False)
         return
 
     # 2. ML Detection Status
     try:
-        response = requests.get(f"{BASE_URL}/detect/status")
+        response = session.get(f"{BASE_URL}/detect/status", timeout=TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data.get('available'):
                 print_status("ML Detection Available", True)
             else:
@@ -54,10 +78,10 @@ def verify_server():
             "password": password,
             "phone_number": phone
         }
-        response = requests.post(f"{BASE_URL}/auth/signup", json=payload)
+        response = post_json(f"{BASE_URL}/auth/signup", payload)
         if response.status_code == 201:
             print_status("User Signup Passed", True)
-            user_token = response.json().get('access_token')
+            user_token = parse_json(response).get('access_token')
         else:
             print_status(f"User Signup Failed: {response.text}", False)
     except Exception as e:
@@ -77,7 +101,7 @@ def verify_server():
             "yeast_count": 5,
             "yeast_confidence": 0.95
         }
-        response = requests.post(f"{BASE_URL}/reports", json=report_payload, headers=headers)
+        response = post_json(f"{BASE_URL}/reports", report_payload, headers=headers)
         if response.status_code == 201:
             print_status("Create Report (Online) Passed", True)
         else:
@@ -95,7 +119,7 @@ def verify_server():
             "calcium_oxalate_count": 2,
             "calcium_oxalate_confidence": 0.88
         }
-        response = requests.post(f"{BASE_URL}/reports", json=queued_report_payload, headers=headers)
+        response = post_json(f"{BASE_URL}/reports", queued_report_payload, headers=headers)
         if response.status_code == 201:
             print_status("Sync Report (Offline Recovery) Passed", True)
         else:
@@ -105,9 +129,9 @@ def verify_server():
 
     # 6. Verify Reports Exist
     try:
-        response = requests.get(f"{BASE_URL}/reports", headers=headers)
+        response = session.get(f"{BASE_URL}/reports", headers=headers, timeout=TIMEOUT)
         if response.status_code == 200:
-            reports = response.json().get('reports', [])
+            reports = parse_json(response).get('reports', [])
             if len(reports) >= 2:
                 print_status(f"Verify Reports Passed (Found {len(reports)} reports)", True)
             else:
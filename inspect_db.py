@@ -1,43 +1,62 @@
 import sqlite3
 import os
+from collections import defaultdict
 
 # Path to the database
 db_path = 'backend/instance/urosmart.db'
 
+
+def quote_identifier(name):
+    """Quote a table name for SQL (names can't be bound as parameters)"""
+    return '"' + name.replace('"', '""') + '"'
+
+
 if not os.path.exists(db_path):
     print(f"Database not found at {db_path}")
     exit(1)
 
 print(f"📂 Database found at: {os.path.abspath(db_path)}\n")
 
-conn = sqlite3.connect(db_path)
+# Read-only: inspecting must never modify (or lock for writing) the app database
+conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+conn.execute("PRAGMA query_only = 1")
 cursor = conn.cursor()
 
-# Get all tables
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-tables = cursor.fetchall()
+# All tables with their columns in one query
+cursor.execute("""
+    SELECT m.name, p.name, p.type
+    FROM sqlite_master AS m
+    JOIN pragma_table_info(m.name) AS p
+    WHERE m.type = 'table'
+    ORDER BY m.rowid, p.cid
+""")
+columns_by_table = defaultdict(list)
+for table_name, column_name, column_type in cursor.fetchall():
+    columns_by_table[table_name].append((column_name, column_type))
+
+# Row counts of all tables in one query
+counts = {}
+if columns_by_table:
+    cursor.execute(" UNION ALL ".join(
+        f"SELECT ?, COUNT(*) FROM {quote_identifier(table_name)}" for table_name in columns_by_table
+    ), list(columns_by_table))
+    counts = dict(cursor.fetchall())
 
 print("📊 Tables found:")
-for table in tables:
-    table_name = table[0]
+for table_name, columns in columns_by_table.items():
     print(f"- {table_name}")
-    
-    # Get columns
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = cursor.fetchall()
+
     print("  Columns:")
-    for col in columns:
-        print(f"    - {col[1]} ({col[2]})")
-    
-    # Get row count
-    cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-    count = cursor.fetchone()[0]
+    for column_name, column_type in columns:
+        print(f"    - {column_name} ({column_type})")
+
+    count = counts[table_name]
     print(f"  Rows: {count}")
-    
+
     # Show sample data (first 2 rows)
     if count > 0:
         print("  Sample Data:")
-        cursor.execute(f"SELECT * FROM {table_name} LIMIT 2")
+        cursor.execute(f"SELECT * FROM {quote_identifier(table_name)} LIMIT 2")
         rows = cursor.fetchall()
         for row in rows:
             print(f"    {row}")